@@ -0,0 +1,133 @@
+"""DONGURI Account List Conversion (2022 fmt --> 2021 fmt)
+
+    - 2022年形式のアカウント一覧（CSV）を、備考 の内容で辞書タイプごとに振り分けて 2021年形式（3列）で出力する
+    - 入力はチャンクごとに読み込み、備考 は1回の走査ですべての辞書タイプに振り分ける
+    - 出力は辞書タイプごとに専用のスレッドで並行に書き出す（同じ出力への書き込み順は保たれる）
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from src.executor import DonguriAccCols
+
+
+ACCOUNT_NOTE_COL = "備考"
+# 辞書タイプ（出力ファイル名の末尾）-> 備考 に含まれる文字列
+DIC_TYPE_RULES: Dict[str, str] = {
+    "6dic": "ジーニアス５辞書",
+    "3dic": "ジーニアス英和/和英",
+}
+CONVERT_CHUNK_ROWS = 50_000
+OUTPUT_FORMATS = ["xlsx", "csv", "parquet"]
+
+
+def classify_notes(notes: pd.Series, rules: Dict[str, str] = DIC_TYPE_RULES) -> Dict[str, np.ndarray]:
+    """row flags of each dic type
+
+        - 備考 の値の種類ごとに1回だけ判定し、行には値のコードで展開する
+        - 備考 が空の行はどの辞書タイプにも含めない
+        - return: dic type -> bool array (rows)
+    """
+    codes, uniques = pd.factorize(notes)
+    flags = {}
+    for dic_type, keyword in rules.items():
+        matched = np.array([keyword in str(value) for value in uniques] + [False], dtype=bool)
+        flags[dic_type] = matched[codes]  # code -1 (NaN) -> 末尾の False
+    return flags
+
+
+class CsvSink:
+    def __init__(self, path: Path, columns: List[str]):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        pd.DataFrame(columns=columns).to_csv(self._file, index=False)
+
+    def write(self, rows: pd.DataFrame) -> None:
+        rows.to_csv(self._file, header=False, index=False)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class XlsxSink:
+    """write-only (streaming) workbook"""
+    def __init__(self, path: Path, columns: List[str]):
+        self.path = path
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet("Sheet1")
+        self._sheet.append(columns)
+
+    def write(self, rows: pd.DataFrame) -> None:
+        for row in rows.astype(object).where(rows.notna(), None).itertuples(index=False):
+            self._sheet.append(row)
+
+    def close(self) -> None:
+        self._workbook.save(self.path)
+
+
+class ParquetSink:
+    """parquet (requires pyarrow)"""
+    def __init__(self, path: Path, columns: List[str]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self._pa = pa
+        self._schema = pa.schema([(col, pa.string()) for col in columns])
+        self._writer = pq.ParquetWriter(str(path), self._schema)
+
+    def write(self, rows: pd.DataFrame) -> None:
+        self._writer.write_table(self._pa.Table.from_pandas(rows, schema=self._schema, preserve_index=False))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+SINKS = {"xlsx": XlsxSink, "csv": CsvSink, "parquet": ParquetSink}
+
+
+def convert_accounts(input_path: str, out_dir: Optional[str] = None, fmt: str = "xlsx",
+                     rules: Dict[str, str] = DIC_TYPE_RULES,
+                     chunksize: int = CONVERT_CHUNK_ROWS) -> Dict[str, Dict]:
+    """split a 2022 fmt account csv into 2021 fmt outputs (one per dic type)
+
+        - 出力: `{out_dir}/{入力ファイル名}_{dic type}.{fmt}`（out_dir の既定は入力ファイルと同じディレクトリ）
+        - return: dic type -> {"path": 出力パス, "rows": 行数}
+    """
+    cols = DonguriAccCols()
+    target_cols = [cols.user_name, cols.group_name, cols.temp_password]
+    out = Path(out_dir) if out_dir is not None else Path(input_path).parent
+    out.mkdir(parents=True, exist_ok=True)
+    fstem = Path(input_path).stem
+
+    sinks = {dic_type: SINKS[fmt](out / f"{fstem}_{dic_type}.{fmt}", target_cols) for dic_type in rules}
+    # 出力ごとに1スレッド: 同じ出力へのチャンクは順番に、異なる出力へは並行に書き込む
+    writers = {dic_type: ThreadPoolExecutor(max_workers=1) for dic_type in rules}
+    pending: List[Future] = []
+    rows = {dic_type: 0 for dic_type in rules}
+    try:
+        reader = pd.read_csv(input_path, usecols=target_cols + [ACCOUNT_NOTE_COL],
+                             dtype=str, encoding="utf-8", chunksize=chunksize)
+        for chunk in reader:
+            for dic_type, flags in classify_notes(chunk[ACCOUNT_NOTE_COL], rules).items():
+                selected = chunk.loc[flags, target_cols]
+                rows[dic_type] += selected.shape[0]
+                pending.append(writers[dic_type].submit(sinks[dic_type].write, selected))
+            # 書き込み待ちのチャンクが溜まりすぎないように、前のチャンクまでの書き込みを待つ
+            for future in pending[:-len(rules)]:
+                future.result()
+            pending = pending[-len(rules):]
+        for future in pending:
+            future.result()
+    finally:
+        closing = [writers[dic_type].submit(sinks[dic_type].close) for dic_type in rules]
+        for writer in writers.values():
+            writer.shutdown(wait=True)
+    for future in closing:
+        future.result()
+    return {dic_type: {"path": sinks[dic_type].path, "rows": rows[dic_type]} for dic_type in rules}
@@ -0,0 +1,109 @@
+"""DataFrame Backends of ShiraishiExecutor
+
+    - 重複除去・結合・振り分けの「どの行を使うか」の計算だけを backend に任せ、
+      結果の DataFrame は常に pandas で組み立てる（どの backend でも結果は同じ）
+    - pandas: 従来どおりの処理（シングルスレッド）
+    - polars: キーの列だけを polars（Arrow、マルチスレッド）に渡して、行の位置を求める
+        - polars が必要（`pip install polars`）
+        - スレッド数は polars の設定（環境変数 POLARS_MAX_THREADS、既定は CPU 数）
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+BACKENDS = ["pandas", "polars"]
+
+
+class PandasBackend:
+    name = "pandas"
+
+    def drop_duplicates(self, data: pd.DataFrame, subset: List[str]) -> pd.DataFrame:
+        """rows of data without duplicates of subset (first occurrence is kept, index is kept)"""
+        return data.drop_duplicates(subset=subset)
+
+    def merge_left(self, left: pd.DataFrame, right: pd.DataFrame, left_on: str, right_on: str) -> pd.DataFrame:
+        """pd.merge(how='left')"""
+        return pd.merge(left, right, how='left', left_on=left_on, right_on=right_on)
+
+    def split(self, data: pd.DataFrame, col: str, values: Sequence) -> List[pd.DataFrame]:
+        """rows of each value of data[col] (index is kept)"""
+        return [data[data[col] == value] for value in values]
+
+    def isin(self, series: pd.Series, values: Sequence) -> np.ndarray:
+        return series.isin(values).to_numpy()
+
+
+class PolarsBackend(PandasBackend):
+    """multi-threaded (polars) row selection, results are assembled with pandas"""
+    name = "polars"
+
+    def __init__(self):
+        import polars as pl
+
+        self._pl = pl
+
+    def _keys(self, data: pd.DataFrame, cols: List[str]):
+        """key columns as a polars DataFrame (category -> string, 欠損は null)"""
+        _pl = self._pl
+        _keys = _pl.from_pandas(data[cols].reset_index(drop=True))
+        return _keys.with_columns(_pl.col(_pl.Categorical).cast(_pl.String))
+
+    def drop_duplicates(self, data: pd.DataFrame, subset: List[str]) -> pd.DataFrame:
+        _pl = self._pl
+        _first = self._keys(data, subset).select(
+            _pl.struct(subset).is_first_distinct()).to_series().to_numpy()
+        return data[_first]
+
+    def merge_left(self, left: pd.DataFrame, right: pd.DataFrame, left_on: str, right_on: str) -> pd.DataFrame:
+        """same as pd.merge(how='left') (no overlapping columns)
+
+            - pd.merge と同じく、欠損のキー同士もマッチさせる
+            - 列名が重複する場合（pd.merge では接尾辞が付く）は pd.merge を使う
+        """
+        if set(left.columns) & set(right.columns):
+            return super().merge_left(left, right, left_on, right_on)
+        _pl = self._pl
+        _key = '__key'
+        _left = self._keys(left, [left_on]).rename({left_on: _key}).with_row_index('__left')
+        _right = self._keys(right, [right_on]).rename({right_on: _key}).with_row_index('__right')
+        _joined = _left.join(_right, on=_key, how='left', nulls_equal=True, maintain_order='left_right')
+        _left_pos = _joined['__left'].to_numpy()
+        _right_pos = _joined['__right'].fill_null(-1).to_numpy().astype(np.int64)
+        # マッチしなかった行（-1）は、存在しないラベルとして reindex されて欠損値の行になる
+        return pd.concat([left.iloc[_left_pos].reset_index(drop=True),
+                          right.reset_index(drop=True).reindex(_right_pos).reset_index(drop=True)], axis=1)
+
+    def split(self, data: pd.DataFrame, col: str, values: Sequence) -> List[pd.DataFrame]:
+        _pl = self._pl
+        _groups: Dict = dict(
+            self._keys(data, [col]).with_row_index('__pos').group_by(col).agg(_pl.col('__pos')).iter_rows())
+        _masks = []
+        for value in values:
+            _mask = np.zeros(data.shape[0], dtype=bool)
+            _mask[_groups.get(value, [])] = True
+            _masks.append(_mask)
+        return [data[_mask] for _mask in _masks]
+
+    def isin(self, series: pd.Series, values: Sequence) -> np.ndarray:
+        """same as Series.isin
+
+            - 欠損値の扱いは dtype によって異なるため、欠損値の行だけは pandas で判定する
+        """
+        _values = self._pl.from_pandas(pd.Series(values, dtype=object))
+        _isin = self._keys(series.to_frame(), [series.name])[series.name].is_in(
+            _values.drop_nulls().implode()).fill_null(False).to_numpy()
+        _na = series.isna().to_numpy()
+        if _na.any():
+            _isin[_na] = series[_na].isin(values).to_numpy()
+        return _isin
+
+
+def get_backend(name: str) -> PandasBackend:
+    if name == "pandas":
+        return PandasBackend()
+    if name == "polars":
+        return PolarsBackend()
+    raise ValueError(f"unknown backend: {name} (available: {', '.join(BACKENDS)})")
@@ -0,0 +1,70 @@
+"""Background Execution of ShiraishiExecutor"""
+
+import threading
+import traceback
+from typing import Dict, Optional
+
+from src.executor import ExecutionCancelled, ShiraishiExecutor
+
+
+class BackgroundJob:
+    """run ShiraishiExecutor.main_func in a worker thread
+
+        - 進捗（実行中のステージ）と状態を、別スレッド（画面側）から参照できるように保持する
+        - cancel() でキャンセルを要求すると、次のステージの開始前に停止する
+        - key: 入力（ファイルの内容ハッシュ・オプション）を表す値。同じ入力の二重実行の判定に使う
+    """
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, key: str, executor: ShiraishiExecutor):
+        self.key = key
+        self.status = self.PENDING
+        self.stage: Optional[str] = None
+        self.stage_index = 0
+        self.stage_count = 0
+        self.error = ""
+        self.traceback = ""
+        self.export_buffers: Dict[str, bytes] = {}
+        self._executor = executor
+        self._cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"executor-{key[:8]}", daemon=True)
+
+    @property
+    def active(self) -> bool:
+        return self.status in (self.PENDING, self.RUNNING)
+
+    def start(self) -> None:
+        self.status = self.RUNNING
+        self._thread.start()
+
+    def cancel(self) -> None:
+        self._cancel_event.set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def progress(self) -> float:
+        """finished stages / all stages (0.0 - 1.0)"""
+        if self.status == self.DONE:
+            return 1.0
+        return self.stage_index / self.stage_count if self.stage_count else 0.0
+
+    def _on_stage(self, name: str, index: int, count: int) -> None:
+        self.stage, self.stage_index, self.stage_count = name, index, count
+
+    def _run(self) -> None:
+        try:
+            self._executor.main_func(on_stage=self._on_stage, cancel_event=self._cancel_event)
+            self.export_buffers = self._executor.export_buffers
+            self.status = self.DONE
+        except ExecutionCancelled:
+            self.status = self.CANCELLED
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.traceback = traceback.format_exc()
+            self.status = self.FAILED
@@ -0,0 +1,125 @@
+"""Batch Runner (multi-school / multi-cohort)"""
+
+import contextlib
+import dataclasses
+import io
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from src.executor import CmsDataCols, ExecutorOptions, ShiraishiExecutor
+
+
+FN_BATCH_SUMMARY = "summary.csv"
+FN_BATCH_LOG = "run.log"
+
+
+@dataclass
+class BatchJob:
+    """one input set of ShiraishiExecutor
+
+        - cms: CMSデータのパス（1つのCMSデータを学校IDで分割する場合は None でよい）
+        - school_id: 1つのCMSデータを分割する場合に、この入力セットに対応する学校ID
+    """
+    name: str
+    dic6: str
+    dic3: str
+    schooltest: str
+    cms: Optional[str] = None
+    school_id: Optional[str] = None
+
+
+def load_manifest(manifest_path: str) -> List[BatchJob]:
+    """load manifest csv
+
+        - columns: name, dic6, dic3, schooltest[, cms][, school_id]
+        - 相対パスはマニフェストファイルのディレクトリを基準にする
+    """
+    base_dir = Path(manifest_path).parent
+    manifest = pd.read_csv(manifest_path, dtype=str, keep_default_na=False)
+
+    def _resolve(path: str) -> Optional[str]:
+        if path == "":
+            return None
+        return str(base_dir / path) if not Path(path).is_absolute() else path
+
+    jobs = []
+    for row in manifest.to_dict(orient="records"):
+        jobs.append(BatchJob(
+            name=row["name"],
+            dic6=_resolve(row["dic6"]),
+            dic3=_resolve(row["dic3"]),
+            schooltest=_resolve(row["schooltest"]),
+            cms=_resolve(row.get("cms", "")),
+            school_id=row.get("school_id") or None))
+    return jobs
+
+
+def partition_cms_by_school(cms_path: str) -> Dict[str, bytes]:
+    """split a multi-school CMS csv into csv bytes per 学校ID (values are kept as they are)"""
+    cols = CmsDataCols()
+    data = pd.read_csv(cms_path, names=list(dataclasses.asdict(cols).values()),
+                       dtype=str, keep_default_na=False, na_filter=False, encoding="utf-8")
+    partitions = {}
+    for school_id, part in data.groupby(cols.school_id, sort=False):
+        partitions[school_id] = part.to_csv(header=False, index=False).encode("utf-8")
+    return partitions
+
+
+def run_job(job: BatchJob, cms_bytes: Optional[bytes], out_dir: str, options: ExecutorOptions) -> Dict:
+    """run ShiraishiExecutor for one job (process pool worker)
+
+        - 出力: `{out_dir}/{job.name}/` に結果ファイルと実行ログ
+    """
+    job_dir = Path(out_dir) / job.name
+    job_dir.mkdir(parents=True, exist_ok=True)
+    result = {"name": job.name, "school_id": job.school_id, "status": "ok", "error": ""}
+    start = time.perf_counter()
+    with open(job_dir / FN_BATCH_LOG, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        try:
+            cms_file = io.BytesIO(cms_bytes) if cms_bytes is not None else open(job.cms, "rb")
+            with cms_file, open(job.dic6, "rb") as dic6, open(job.dic3, "rb") as dic3, \
+                    open(job.schooltest, "rb") as schooltest:
+                executor = ShiraishiExecutor(cms_file, dic6, dic3, schooltest,
+                                             dataclasses.replace(options, out_dir=str(job_dir)))
+                executor.main_func()
+            result.update(executor.summary())
+        except Exception as e:
+            traceback.print_exc(file=log)
+            result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_batch(jobs: List[BatchJob], out_dir: str, cms_path: Optional[str] = None,
+              max_workers: Optional[int] = None, options: Optional[ExecutorOptions] = None) -> pd.DataFrame:
+    """run jobs in a process pool and write the combined summary
+
+        - cms_path: 指定した場合は、このCMSデータを学校IDで分割し、各ジョブの school_id に対応する分を使う
+        - return: summary (1 row per job, `{out_dir}/summary.csv` にも出力)
+    """
+    options = options if options is not None else ExecutorOptions()
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+    partitions: Dict[str, bytes] = {}
+    if cms_path is not None:
+        partitions = partition_cms_by_school(cms_path)
+        missing = [job.name for job in jobs if job.school_id not in partitions]
+        if missing:
+            raise ValueError(f"school_id not found in {cms_path}: {missing}")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(run_job, job, partitions.get(job.school_id) if cms_path is not None else None,
+                        out_dir, options)
+            for job in jobs]
+        results = [future.result() for future in futures]
+
+    summary = pd.DataFrame(results)
+    summary.to_csv(Path(out_dir) / FN_BATCH_SUMMARY, index=False)
+    return summary
@@ -0,0 +1,228 @@
+"""Benchmarks"""
+
+import contextlib
+import dataclasses
+import io
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.backends import BACKENDS
+from src.executor import DonguriAccount, ExecutorOptions, ShiraishiExecutor, write_workbook, write_workbook_fast
+from src.profiling import peak_rss_mib
+from src.synth import generate_inputs, input_paths
+
+
+BENCH_SIZES: List[int] = [1_000, 10_000, 100_000, 1_000_000]
+BENCH_BASELINE_PATH = "bench/baseline.json"
+# 回帰とみなす閾値: ベースラインより (1 + threshold) 倍以上、かつ min_seconds 以上遅くなった場合
+BENCH_THRESHOLD = 0.25
+BENCH_MIN_SECONDS = 0.05
+
+
+def measure(func: Callable[[], object]) -> Dict[str, Optional[float]]:
+    """measure wall time and peak RSS growth of func (1回だけ実行する)
+
+        - peak_mib: func の実行中に peak RSS が増えた量（入力データの準備は含めない）
+        - peak RSS はプロセス単位の最大値のため、ケースごとに新しいプロセスで呼ぶ（run_case）
+        - resource モジュールがない環境（Windows）では peak_mib は None
+    """
+    before = peak_rss_mib()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    after = peak_rss_mib()
+    return {'seconds': seconds, 'peak_mib': after - before if before is not None and after is not None else None}
+
+
+def run_case(case: Callable[..., Dict], *args) -> Dict:
+    """run a benchmark case (module level function, calls measure) in a fresh process"""
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(case, *args).result()
+
+
+def sample_result_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """result-like frame (購入者シート相当の列構成)"""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(rows)
+    return pd.DataFrame({
+        'テスト番号': [f'T{i:07d}' for i in ids],
+        'コース': rng.choice(['特進', '進学', '総合'], size=rows),
+        'クラス': rng.choice(list('ABCDEFG'), size=rows),
+        '氏　名': [f'生徒{i}' for i in ids],
+        'ID': ids + 1,
+        '学籍番号': [f'T{i:07d}' for i in ids],
+        '生徒名': [f'生徒{i}' for i in ids],
+        '副教材タイプ': rng.choice(['6辞書', '3辞書'], size=rows),
+        'ユーザー名': [f'user{i:07d}' for i in ids],
+        'グループ名': 'group',
+        '一時パスワード': [f'pw{i:07d}' for i in ids],
+    })
+
+
+def _export_case(rows: int, path_name: str) -> Dict[str, Optional[float]]:
+    """write 3 workbooks of 2 sheets (rows) by path_name ('default' / 'fast')"""
+    data = sample_result_frame(rows)
+    workbooks = [{'sheet1': data, 'sheet2': data} for _ in range(3)]
+
+    def _default():
+        for sheets in workbooks:
+            write_workbook(io.BytesIO(), sheets)
+
+    def _fast():
+        with ThreadPoolExecutor(max_workers=len(workbooks)) as pool:
+            list(pool.map(lambda sheets: write_workbook_fast(io.BytesIO(), sheets), workbooks))
+
+    return measure(_fast if path_name == 'fast' else _default)
+
+
+def bench_export(row_counts: List[int]) -> Iterator[Dict[str, float]]:
+    """compare the default export path with the fast (write-only, concurrent) path
+
+        - 1回の export と同じく、2シートずつのワークブックを3つ書き出す
+    """
+    for rows in row_counts:
+        for path_name in ['default', 'fast']:
+            yield {'rows': rows, 'path': path_name, **run_case(_export_case, rows, path_name)}
+
+
+def sample_donguri_workbook(rows: int) -> bytes:
+    """DONGURI account workbook (受け渡しに使わない列も含む)"""
+    ids = np.arange(rows)
+    data = pd.DataFrame({
+        'ユーザー名': [f'user{i:07d}' for i in ids],
+        'グループ名': 'group',
+        '一時パスワード': [f'{i:08d}' for i in ids],
+        '氏名': '',
+        '有効期限': '2023/03/31',
+        '備考': 'ジーニアス５辞書',
+    })
+    buffer = io.BytesIO()
+    write_workbook_fast(buffer, {'Sheet1': data})
+    return buffer.getvalue()
+
+
+def _donguri_load_case(rows: int, fast_load: bool) -> Dict[str, Optional[float]]:
+    workbook = sample_donguri_workbook(rows)
+    return measure(lambda: DonguriAccount(io.BytesIO(workbook), fast_load=fast_load))
+
+
+def bench_donguri_load(row_counts: List[int]) -> Iterator[Dict[str, float]]:
+    """compare the default DONGURI account loading with the fast (projected, string dtype) loading"""
+    for rows in row_counts:
+        for path_name, fast_load in [('default', False), ('fast', True)]:
+            yield {'rows': rows, 'path': path_name, **run_case(_donguri_load_case, rows, fast_load)}
+
+
+def run_pipeline(paths: Dict[str, str], options: ExecutorOptions) -> Dict:
+    """run ShiraishiExecutor end to end and return the profiler report (run in a fresh process)"""
+    with contextlib.redirect_stdout(io.StringIO()), open(paths["cms"], "rb") as cms, \
+            open(paths["dic6"], "rb") as dic6, open(paths["dic3"], "rb") as dic3, \
+            open(paths["schooltest"], "rb") as schooltest:
+        executor = ShiraishiExecutor(cms, dic6, dic3, schooltest, options)
+        executor.main_func()
+    return {**executor.profiler.report(), "summary": executor.summary()}
+
+
+def run_suite(sizes: List[int], data_dir: str, options: Optional[ExecutorOptions] = None) -> Iterator[Dict]:
+    """run the pipeline on synthetic inputs of each size (number of students)
+
+        - 入力データは `{data_dir}/{size}/` に生成し、2回目以降は再利用する
+        - サイズごとに新しいプロセスで実行する（peak RSS をサイズごとに計測するため）
+    """
+    options = options if options is not None else ExecutorOptions(out_dir=None)
+    for size in sizes:
+        size_dir = str(Path(data_dir) / str(size))
+        paths = {key: str(path) for key, path in input_paths(size_dir).items()}
+        if not all(Path(path).exists() for path in paths.values()):
+            generate_inputs(size, size_dir)
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            report = pool.submit(run_pipeline, paths, options).result()
+        yield {"size": size, **report}
+
+
+def bench_low_memory(paths: Dict[str, str], options: Optional[ExecutorOptions] = None) -> Iterator[Dict]:
+    """run the pipeline without / with options.low_memory (copy-on-write), each in a fresh process
+
+        - peak RSS はプロセス単位の最大値のため、モードごとに新しいプロセスで実行する
+    """
+    options = options if options is not None else ExecutorOptions(out_dir=None)
+    for mode, low_memory in [('default', False), ('low_memory', True)]:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            report = pool.submit(run_pipeline, paths, dataclasses.replace(options, low_memory=low_memory)).result()
+        yield {"mode": mode, **report}
+
+
+def frame_bytes(data: pd.DataFrame) -> bytes:
+    """serialized data (dtypes + index + values) to compare results byte by byte"""
+    return (repr(data.dtypes.to_dict()) + "\n" + data.to_csv(index=True)).encode("utf-8")
+
+
+def compare_backends(paths: Dict[str, str], options: Optional[ExecutorOptions] = None,
+                     backends: Optional[List[str]] = None) -> Dict:
+    """run the pipeline with each DataFrame backend and compare the result sheets byte by byte
+
+        - 最初の backend の結果を基準に、dtype・index・値（CSV にしたバイト列）が一致するかを確認する
+        - return: dict
+            - seconds: backend -> 実行時間（読み込みを含む）
+            - mismatches: 一致しなかったシート（`backend: file / sheet`）
+    """
+    options = options if options is not None else ExecutorOptions(out_dir=None)
+    backends = backends if backends is not None else BACKENDS
+    seconds = {}
+    results = {}
+    for backend in backends:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), open(paths["cms"], "rb") as cms, \
+                open(paths["dic6"], "rb") as dic6, open(paths["dic3"], "rb") as dic3, \
+                open(paths["schooltest"], "rb") as schooltest:
+            executor = ShiraishiExecutor(cms, dic6, dic3, schooltest, dataclasses.replace(options, backend=backend))
+            executor.main_func()
+        seconds[backend] = time.perf_counter() - start
+        results[backend] = {(file_name, sheet_name): frame_bytes(data)
+                            for file_name, sheets in executor.result_workbooks().items()
+                            for sheet_name, data in sheets.items()}
+
+    expected = results[backends[0]]
+    mismatches = [f"{backend}: {file_name} / {sheet_name}"
+                  for backend in backends[1:]
+                  for file_name, sheet_name in sorted(set(expected) | set(results[backend]))
+                  if expected.get((file_name, sheet_name)) != results[backend].get((file_name, sheet_name))]
+    return {"seconds": seconds, "mismatches": mismatches}
+
+
+def suite_meta() -> Dict[str, str]:
+    return {"python": platform.python_version(), "pandas": pd.__version__,
+            "platform": platform.platform(), "machine": platform.machine()}
+
+
+def stage_seconds(report: Dict) -> Dict[str, float]:
+    """stage name -> seconds (+ total)"""
+    seconds = {stage["name"]: stage["seconds"] for stage in report["stages"]}
+    seconds["total"] = report["total_seconds"]
+    return seconds
+
+
+def find_regressions(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float = BENCH_THRESHOLD,
+                     min_seconds: float = BENCH_MIN_SECONDS) -> List[str]:
+    """compare stage seconds with the baseline
+
+        - results / baseline: size(str) -> report
+    """
+    regressions = []
+    for size, report in results.items():
+        if size not in baseline:
+            continue
+        base_seconds = stage_seconds(baseline[size])
+        for name, seconds in stage_seconds(report).items():
+            base = base_seconds.get(name)
+            if base is None:
+                continue
+            if seconds > base * (1 + threshold) and seconds - base > min_seconds:
+                regressions.append(f"size={size} stage={name}: {base:.3f}s -> {seconds:.3f}s")
+    return regressions
@@ -0,0 +1,214 @@
+"""Worker Daemon (localhost HTTP)
+
+    - pandas などを読み込み済みのワーカープロセスを常駐させ、toolbox.py のジョブを受け付ける
+        - 起動時にワーカープロセスを立ち上げて import を済ませておく（ジョブごとの起動・import を省く）
+        - ワーカー数までのジョブを並行に実行し、それ以上はキューで待たせる
+    - API (JSON)
+        - POST /jobs {"type": ..., "args": {...}, "cwd": ...} -> {"id": ...}
+        - GET /jobs/<id> -> {"id", "type", "status": queued|running|done|failed, "result", "output", "error"}
+            - 終了したジョブは、結果を返した時点で破棄する
+        - GET /health -> {"status": "ok", "workers": ..., "jobs": ...}
+    - 認証（ジョブは作業ディレクトリ・出力先を指定できるため、本人以外からのリクエストは受け付けない）
+        - 起動時にランダムなトークンを作り、本人だけが読めるファイル（0600、src/daemon_client.token_path）に保存する
+        - すべてのリクエストで `Authorization: Bearer <token>` を確認する
+        - ブラウザからのリクエスト（Origin ヘッダーがあるもの）と、POST で Content-Type が application/json でないものは拒否する
+"""
+
+import contextlib
+import hmac
+import io
+import json
+import os
+import secrets
+import threading
+import traceback
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from src.daemon_client import DAEMON_DEFAULT_PORT, token_path
+
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = DAEMON_DEFAULT_PORT
+# ワーカープロセスで事前に読み込むモジュール
+WARM_MODULES = ["pandas", "numpy", "openpyxl", "chardet", "pdfkit", "src.executor", "src.transcode"]
+
+
+def warm_imports() -> None:
+    """process pool initializer"""
+    import importlib
+
+    for module in WARM_MODULES:
+        importlib.import_module(module)
+
+
+def run_emulator_job(args: Dict) -> Dict:
+    """ShiraishiExecutor (same as `toolbox.py emulator`)
+
+        - args: input_cms / input_dic6 / input_dic3 / input_schooltest, options (ExecutorOptions のフィールド)
+    """
+    from src.executor import ExecutorOptions, ShiraishiExecutor
+
+    options = ExecutorOptions(**args.get("options", {}))
+    with open(args["input_cms"], "rb") as cms, open(args["input_dic6"], "rb") as dic6, \
+            open(args["input_dic3"], "rb") as dic3, open(args["input_schooltest"], "rb") as schooltest:
+        executor = ShiraishiExecutor(cms, dic6, dic3, schooltest, options)
+        executor.main_func()
+    return executor.summary()
+
+
+def run_stats_job(args: Dict) -> Dict:
+    """CMS statistics (same as `toolbox.py stats`), args: inputs, cache_dir"""
+    from src.executor import aggregate_cms_files
+
+    return {"stats": aggregate_cms_files(args["inputs"], args.get("cache_dir")).to_dict(orient="records")}
+
+
+def run_to_utf8_job(args: Dict) -> Dict:
+    """encoding conversion (same as `toolbox.py to-utf8`), args: input, output"""
+    from src.transcode import convert_file
+
+    return {"results": [convert_file(args["input"], args.get("output"))]}
+
+
+JOB_TYPES: Dict[str, Callable[[Dict], Dict]] = {
+    "emulator": run_emulator_job,
+    "stats": run_stats_job,
+    "to-utf8": run_to_utf8_job,
+}
+
+
+def run_job(job_type: str, args: Dict, cwd: Optional[str]) -> Dict:
+    """run a job in a worker process
+
+        - 相対パスはクライアントの作業ディレクトリ (cwd) を基準にする
+        - ワーカーは1度に1ジョブだけ実行するため、作業ディレクトリ・標準出力の切り替えは他のジョブに影響しない
+    """
+    output = io.StringIO()
+    if cwd is not None:
+        os.chdir(cwd)
+    with contextlib.redirect_stdout(output):
+        result = JOB_TYPES[job_type](args)
+    return {"result": result, "output": output.getvalue()}
+
+
+def write_token(path: Path, token: str) -> Path:
+    """save the token readable only by the user (directory: 0700, file: 0600)"""
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        file.write(token)
+    return path
+
+
+class WorkerDaemon(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = DAEMON_HOST, port: int = DAEMON_PORT, max_workers: Optional[int] = None):
+        super().__init__((host, port), DaemonRequestHandler)
+        self.token = secrets.token_urlsafe(32)
+        self.token_path = write_token(token_path(self.server_address[1]), self.token)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=warm_imports)
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        # ワーカープロセスを起動して import を済ませておく
+        for future in [self.pool.submit(warm_imports) for _ in range(self.max_workers)]:
+            future.result()
+
+    def submit(self, job_type: str, args: Dict, cwd: Optional[str]) -> str:
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"unknown job type: {job_type} (available: {', '.join(JOB_TYPES)})")
+        job_id = uuid.uuid4().hex
+        future = self.pool.submit(run_job, job_type, args, cwd)
+        with self._lock:
+            self._jobs[job_id] = {"type": job_type, "future": future}
+        return job_id
+
+    def job_status(self, job_id: str) -> Optional[Dict]:
+        """status of a job (None if unknown), finished jobs are removed"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            future: Future = job["future"]
+            status = {"id": job_id, "type": job["type"], "status": "queued", "result": None, "output": "", "error": ""}
+            if future.running():
+                status["status"] = "running"
+            if not future.done():
+                return status
+            del self._jobs[job_id]
+        try:
+            status.update(status="done", **future.result())
+        except Exception as e:
+            status.update(status="failed", error=f"{type(e).__name__}: {e}",
+                          output="".join(traceback.format_exception(e)))
+        return status
+
+    def job_count(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.token_path.unlink(missing_ok=True)
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    server: WorkerDaemon
+
+    def _authorized(self) -> bool:
+        """check the token (and reject requests from browsers), send 403 if not authorized"""
+        _authorization = self.headers.get("Authorization", "")
+        if self.headers.get("Origin") is not None or not hmac.compare_digest(
+                _authorization.encode("utf-8"), f"Bearer {self.server.token}".encode("utf-8")):
+            self._send(403, {"error": "forbidden"})
+            return False
+        return True
+
+    def do_GET(self) -> None:
+        if not self._authorized():
+            return
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "workers": self.server.max_workers, "jobs": self.server.job_count()})
+        elif self.path.startswith("/jobs/"):
+            status = self.server.job_status(self.path[len("/jobs/"):])
+            if status is None:
+                self._send(404, {"error": "job not found"})
+            else:
+                self._send(200, status)
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        if not self._authorized():
+            return
+        if self.headers.get_content_type() != "application/json":
+            self._send(415, {"error": "Content-Type must be application/json"})
+            return
+        if self.path != "/jobs":
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            job_id = self.server.submit(body["type"], body.get("args", {}), body.get("cwd"))
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": f"{type(e).__name__}: {e}"})
+            return
+        self._send(202, {"id": job_id})
+
+    def _send(self, code: int, payload: Dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
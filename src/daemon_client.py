@@ -0,0 +1,68 @@
+"""Worker Daemon Client
+
+    - toolbox.py から daemon（src/daemon.py）にジョブを送る
+    - 標準ライブラリだけを使う（クライアント側で pandas などを読み込まない）
+    - 認証: daemon が起動時に作るトークンファイル（本人だけが読める 0600）を読み、すべてのリクエストに付ける
+"""
+
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Dict
+
+
+DAEMON_POLL_SECONDS = 0.05
+DAEMON_TOKEN_DIR = Path.home() / ".cache" / "toolbox"
+DAEMON_DEFAULT_PORT = 8765
+
+
+class DaemonError(Exception):
+    """the daemon could not run the job"""
+
+
+def token_path(port: int) -> Path:
+    """token file of the daemon listening on the port"""
+    return DAEMON_TOKEN_DIR / f"daemon-{port}.token"
+
+
+def read_token(daemon_url: str) -> str:
+    port = urllib.parse.urlsplit(daemon_url).port or DAEMON_DEFAULT_PORT
+    try:
+        return token_path(port).read_text(encoding="utf-8").strip()
+    except OSError as e:
+        raise DaemonError(f"token of the daemon is not readable: {token_path(port)} ({e})") from e
+
+
+def _request(url: str, token: str, payload: Dict = None) -> Dict:
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json",
+                                                              "Authorization": f"Bearer {token}"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise DaemonError(json.loads(e.read()).get("error", str(e))) from e
+    except urllib.error.URLError as e:
+        raise DaemonError(f"daemon is not reachable: {url} ({e.reason})") from e
+
+
+def run_remote(daemon_url: str, job_type: str, args: Dict) -> Dict:
+    """submit a job and wait for it
+
+        - 相対パスは、この（クライアントの）作業ディレクトリを基準に daemon 側で解決される
+        - return: {"result": ..., "output": ジョブの標準出力}
+    """
+    base_url = daemon_url.rstrip("/")
+    token = read_token(base_url)
+    job_id = _request(f"{base_url}/jobs", token, {"type": job_type, "args": args, "cwd": os.getcwd()})["id"]
+    while True:
+        status = _request(f"{base_url}/jobs/{job_id}", token)
+        if status["status"] == "done":
+            return status
+        if status["status"] == "failed":
+            raise DaemonError(f"{status['error']}\n{status['output']}")
+        time.sleep(DAEMON_POLL_SECONDS)
@@ -0,0 +1,58 @@
+"""Debug Artifacts (opt-in dump of intermediate data)"""
+
+import os
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+
+class DebugArtifacts:
+    """debug artifacts writer
+
+        - 無効時（root_dir=None）: `dump()` は何もしない（通常実行のコストはゼロ）
+        - 有効時: `<root_dir>/<日時>-<pid>-<uid>/<name>.pkl` に中間データを保存する
+            - 実行ごとにディレクトリを分けるので、同じ作業ディレクトリで複数実行しても衝突しない
+            - ディレクトリと書き込みスレッドは最初の `dump()` で作る（何も保存しない場合は空のディレクトリを残さない）
+            - 書き込みはバックグラウンドスレッドで行う（`close()` で完了を待つ）
+            - 読み込みは `pd.read_pickle(path)`
+    """
+    def __init__(self, root_dir: Optional[str] = None):
+        self.root_dir: Optional[Path] = Path(root_dir) if root_dir is not None else None
+        self.run_dir: Optional[Path] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._futures: List[Future] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.root_dir is not None
+
+    def __start(self) -> None:
+        run_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.run_dir = self.root_dir / run_name
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debug-artifacts")
+
+    def dump(self, name: str, data: pd.DataFrame) -> None:
+        """dump a snapshot of data as `<name>.pkl` (no-op if disabled)"""
+        if self.root_dir is None:
+            return
+        if self._pool is None:
+            self.__start()
+        # 後続の処理で data が変更されても影響しないようにスナップショットを取る
+        snapshot = data.copy()
+        self._futures.append(self._pool.submit(snapshot.to_pickle, self.run_dir / f"{name}.pkl"))
+
+    def close(self) -> None:
+        """wait for pending writes and raise the first write error if any (dump() is a no-op afterwards)"""
+        self.root_dir = None
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=True)
+        self._pool = None
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
@@ -1,12 +1,23 @@
 """Main Process Executor"""
 
-from dataclasses import asdict, dataclass
+import contextlib
+import copy
+import importlib.util
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, fields
 from pathlib import Path
-from typing import List, Tuple, Final
+from typing import Callable, Dict, List, Optional, Set, Tuple, Final
 
 import pandas as pd
 import numpy as np
 
+from src.backends import PandasBackend, get_backend
+from src.debug_artifacts import DebugArtifacts
+from src.frame_cache import FrameCache, content_digest, stream_digest
+from src.profiling import StageProfiler
+
 
 OUT_DIR: Final[str] = "./cache"
 
@@ -19,6 +30,7 @@ FN_FAILED_STUDENTS: Final[str] = "DONGURIアカウント情報紐付けに失敗
 FP_FAILED_STUDENTS: Final[str] = f"{OUT_DIR}/{FN_FAILED_STUDENTS}"
 SHN_FAILED_STUDENTS_JYG: Final[str] = "生徒一覧"
 SHN_FAILED_STUDENTS_CMS: Final[str] = "購入情報-マッチング候補"
+SHN_FAILED_STUDENTS_CANDIDATES: Final[str] = "自動マッチング候補"
 
 FN_REST_DONGURI_ACC: Final[str] = "DONGURI残りのアカウント一覧.xlsx"
 FP_REST_DONGURI_ACC: Final[str] = f"{OUT_DIR}/{FN_REST_DONGURI_ACC}"
@@ -42,53 +54,175 @@ class BuyingDicType:
 buying_dic_type = BuyingDicType()
 
 
+def lazy_copy(obj):
+    """copy of a DataFrame / Series that the caller may modify
+
+        - copy-on-write が有効な場合（低メモリモード）は遅延コピー（変更されるまでデータを共有する）
+        - 無効な場合は従来どおり全体をコピーする
+    """
+    return obj.copy(deep=not pd.options.mode.copy_on_write)
+
+
+def memory_mode(options: "ExecutorOptions"):
+    """context of the pandas options for options.low_memory (copy-on-write)"""
+    if options.low_memory:
+        return pd.option_context("mode.copy_on_write", True)
+    return contextlib.nullcontext()
+
+
+def col_dtype(name: str, dtype: str):
+    """column name field with its dtype (schema)"""
+    return field(default=name, metadata={"dtype": dtype})
+
+
+def schema_dtypes(cols, col_names: Optional[List[str]] = None) -> Dict[str, str]:
+    """column name -> dtype of a schema dataclass (Cols)
+
+        - col_names: 指定した列だけ
+        - 読み込み時に dtype として渡す（読み込み後の型変換は不要）
+            - 低カーディナリティの列: category
+            - ID・名前など: string（欠損は <NA>）、数値: Int64（欠損があっても float にならない）
+    """
+    dtypes = {getattr(cols, f.name): f.metadata["dtype"] for f in fields(cols) if "dtype" in f.metadata}
+    if col_names is None:
+        return dtypes
+    return {col: dtype for col, dtype in dtypes.items() if col in col_names}
+
+
+def load_cached(cache: Optional[FrameCache], kind: str, source, params: Dict, load: Callable,
+                dump: Callable, restore: Callable, digest: Optional[str] = None):
+    """load an input file through the frame cache
+
+        - cache が None の場合は load(source) をそのまま返す
+        - source: ファイルパスまたはファイルオブジェクト（内容のハッシュをキャッシュのキーにする）
+            - ハッシュはチャンクごとに計算する（シークできないファイルオブジェクトだけはメモリに読み込む）
+            - digest: 内容のハッシュ（計算済みの場合）
+        - params: キーに含める読み込みのパラメーター（結果が変わるもの）
+        - ヒットした場合はパース・前処理をせずに restore(frames) を返し、
+          しなかった場合は load(source) の結果を dump(loaded) で保存する
+    """
+    if cache is None:
+        return load(source)
+    if digest is None:
+        if isinstance(source, (str, Path)) or source.seekable():
+            # 内容はチャンクごとにハッシュし、パースは先頭から（ファイル全体をメモリに載せない）
+            digest = stream_digest(source)
+        else:
+            content = source.read()
+            digest = content_digest(content)
+            source = io.BytesIO(content)
+    return cache.get_or_load(cache.key(kind, digest, params), kind, lambda: load(source), dump, restore)
+
+
 @dataclass
 class CmsDataCols:
-    id: str = "ID"
-    student_id: str = "学籍番号"
-    student_name: str = "生徒名"
-    student_name_kana: str = "生徒名（カナ）"
-    email: str = "メールアドレス"
-    registered: str = "registered"
-    school_id: str = "学校ID"
-    cur_school_year: str = "現在の学年"
-    prod_name: str = "商品名"
+    id: str = col_dtype("ID", "Int64")
+    student_id: str = col_dtype("学籍番号", "string")
+    student_name: str = col_dtype("生徒名", "string")
+    student_name_kana: str = col_dtype("生徒名（カナ）", "string")
+    email: str = col_dtype("メールアドレス", "string")
+    registered: str = col_dtype("registered", "string")
+    school_id: str = col_dtype("学校ID", "category")
+    cur_school_year: str = col_dtype("現在の学年", "Int64")
+    prod_name: str = col_dtype("商品名", "category")
 
 DICTYPE_COL_NAME: Final[str] = "副教材タイプ"
+# 学籍番号が空の生徒に割り振る仮IDの接頭辞（CmsData.load_prep）
+VIRTUAL_ID_PREFIX: Final[str] = "empty_id_"
 
 
-class CmsData:
+@dataclass
+class CmsIdIssues:
+    """学籍番号の仮ID割り振り（Hotfix）でカバーできないケース
 
-    def __init__(self, csv_file):
-        self.cols = CmsDataCols()
-        self.dictype = BuyingDicType()
-        self.load_prep(csv_file)
+        - duplicated_student_ids: 空ではない学籍番号が、異なるメールアドレス間で重複している行 (学籍番号, メールアドレス)
+        - shared_empty_id_emails: 学籍番号が空で、同一メールアドレスを複数の生徒名が使っている行 (メールアドレス, 生徒名)
+    """
+    duplicated_student_ids: pd.DataFrame
+    shared_empty_id_emails: pd.DataFrame
 
-    def load_prep(self, csv_file) -> None:
-        """load and preparation"""
 
-        # load csv file
-        col_names = list(asdict(self.cols).values())
-        self.data = pd.read_csv(
-            csv_file,
-            names=col_names,
-            encoding="utf-8")
+# newbie_only で読み込む場合のチャンクの行数
+CMS_CHUNK_ROWS: Final[int] = 100_000
 
-        # ----------------------------
-        # preparation
-        # ----------------------------
-        # drop (student_id & name & prod_name) duplicated rows
-        # causion! empty student_id exists
-        self.data.drop_duplicates(
-            subset=[self.cols.student_id, self.cols.student_name, self.cols.prod_name],
-            inplace=True)
+
+class CmsData:
+
+    def __init__(self, csv_file, debug: Optional[DebugArtifacts] = None, newbie_only: bool = False,
+                 chunksize: int = CMS_CHUNK_ROWS, usecols: Optional[List[str]] = None,
+                 backend: Optional[PandasBackend] = None):
+        self.cols = CmsDataCols()
+        self.dictype = BuyingDicType()
+        self.debug = debug if debug is not None else DebugArtifacts()
+        self.load_prep(csv_file, newbie_only, chunksize, usecols, backend)
+
+    def to_frames(self) -> Dict[str, pd.DataFrame]:
+        """prepped frames (frame cache)"""
+        return {"data": self.data,
+                "duplicated_student_ids": self.id_issues.duplicated_student_ids,
+                "shared_empty_id_emails": self.id_issues.shared_empty_id_emails}
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame], debug: Optional[DebugArtifacts] = None) -> "CmsData":
+        """restore prepped data without parsing (frame cache)"""
+        cms_data = cls.__new__(cls)
+        cms_data.cols = CmsDataCols()
+        cms_data.dictype = BuyingDicType()
+        cms_data.debug = debug if debug is not None else DebugArtifacts()
+        cms_data.data = frames["data"]
+        cms_data.id_issues = CmsIdIssues(duplicated_student_ids=frames["duplicated_student_ids"],
+                                         shared_empty_id_emails=frames["shared_empty_id_emails"])
+        cms_data.debug.dump('loadprep', cms_data.data)
+        return cms_data
+
+    def newbie_ingest_cols(self) -> List[str]:
+        """columns used by the pipeline (newbie_only で読み込む列)"""
+        return [self.cols.id, self.cols.student_id, self.cols.student_name, self.cols.student_name_kana,
+                self.cols.email, self.cols.cur_school_year, self.cols.prod_name]
+
+    def load_prep(self, csv_file, newbie_only: bool = False, chunksize: int = CMS_CHUNK_ROWS,
+                  usecols: Optional[List[str]] = None, backend: Optional[PandasBackend] = None) -> None:
+        """load and preparation
+
+            - newbie_only: 新入生（現在の学年 == 0）の行だけを残す
+                - CSVをチャンクごとに読み込み、学年で絞り込み・必要な列だけに射影してから前処理する
+                - 全体を読み込んでから新入生を抽出した場合と同じ結果になる
+                - ただし id_issues は新入生の行だけが対象になる
+            - usecols: 読み込む列（newbie_only でない場合）。前処理に使う 学籍番号 / 生徒名 / メールアドレス / 商品名 は必須
+            - backend: 重複除去に使う DataFrame backend（src.backends、None の場合は pandas）
+        """
+        backend = backend if backend is not None else PandasBackend()
+        if newbie_only:
+            _virtual_id_nums = self.__load_newbie_chunks(csv_file, chunksize)
+        else:
+            # load csv file
+            col_names = list(asdict(self.cols).values())
+            self.data = pd.read_csv(
+                csv_file,
+                names=col_names,
+                usecols=usecols,
+                dtype=schema_dtypes(self.cols),
+                encoding="utf-8")
+
+            # ----------------------------
+            # preparation
+            # ----------------------------
+            # drop (student_id & name & prod_name) duplicated rows
+            # causion! empty student_id exists
+            self.data = backend.drop_duplicates(
+                self.data, [self.cols.student_id, self.cols.student_name, self.cols.prod_name])
+
+            # 学籍番号が空の生徒のアドレス一覧(unique)を取得し、出現順に番号を振る（仮ID用）
+            # - NaN のアドレスも番号を1つ消費する（どの行にもマッチしない）
+            empty_id_students = self.data.loc[self.data[self.cols.student_id].isna(), self.cols.email].unique()
+            _virtual_id_nums = pd.Series(np.arange(len(empty_id_students)), index=empty_id_students)
+            _virtual_id_nums = _virtual_id_nums[_virtual_id_nums.index.notna()]
 
         # convert XXX(kana) --> XXX
-        _temp = self.data[self.cols.student_name].copy()
-        _temp = _temp.str.split('(', expand=True)[0] # exclude (kana)
+        _temp = self.data[self.cols.student_name].str.split('(', expand=True)[0] # exclude (kana)
         _temp = _temp.str.strip() # remove white space
         _temp = _temp.str.replace("　", "") # remove ZENKAKU space
-        self.data[self.cols.student_name] = _temp.copy()
+        self.data[self.cols.student_name] = _temp
 
         # ----------------------------
         # Hotfix Data Transformation
@@ -100,26 +234,88 @@ class CmsData:
         # -----
         # - 恒久対応は、そもそも学籍番号が重複したデータを作らないようにシステムを改修すること
         # ----------------------------
-        # 学籍番号が空の生徒のアドレス一覧(unique)を取得
-        empty_id_students = self.data[self.data[self.cols.student_id].isna()].copy()
-        empty_id_students = empty_id_students[self.cols.email].unique()
-
-        # 仮のIDを生徒ごとに割り振る
-        for i, email in enumerate(empty_id_students):
-            virtual_id = 'empty_id_' + str(i)
-            self.data.loc[self.data[self.cols.email] == email, self.cols.student_id] = virtual_id
-
-        self.data.to_csv('output-loadprep.csv', index=False)
+        _empty_id_flgs = self.data[self.cols.student_id].isna()
+
+        # カバーできていないケースを検出（副次出力）
+        _id_emails = self.data.loc[~_empty_id_flgs, [self.cols.student_id, self.cols.email]].drop_duplicates()
+        _email_names = self.data.loc[_empty_id_flgs, [self.cols.email, self.cols.student_name]].drop_duplicates()
+        self.id_issues = CmsIdIssues(
+            duplicated_student_ids=_id_emails[
+                _id_emails.duplicated(subset=[self.cols.student_id], keep=False)].reset_index(drop=True),
+            shared_empty_id_emails=_email_names[
+                _email_names[self.cols.email].notna()
+                & _email_names.duplicated(subset=[self.cols.email], keep=False)].reset_index(drop=True))
+
+        # 仮のIDを生徒（アドレス）ごとに割り振る
+        _virtual_id_nums = self.data[self.cols.email].map(_virtual_id_nums)
+        _has_virtual_id = _virtual_id_nums.notna()
+        self.data.loc[_has_virtual_id, self.cols.student_id] = (
+            VIRTUAL_ID_PREFIX + _virtual_id_nums[_has_virtual_id].astype(int).astype(str))
+
+        self.debug.dump('loadprep', self.data)
+
+    def __load_newbie_chunks(self, csv_file, chunksize: int) -> pd.Series:
+        """read csv in chunks and keep newbie rows only (sets self.data)
+
+            全学年を読み込んだ場合と同じ結果にするため、全学年の行について下記だけを保持する
+            - 重複除去: (学籍番号, 生徒名, 商品名) のハッシュ値（先に出現した行を残す）
+                - 読み込み後に全行のハッシュ値で1回だけ duplicated()（ハッシュテーブル）を計算する
+            - 仮ID: 学籍番号が空の行のアドレス（と行の位置）
+
+            - return: 仮ID用のアドレスごとの番号 (email -> number)
+        """
+        key_cols = [self.cols.student_id, self.cols.student_name, self.cols.prod_name]
+        chunk_keys = []
+        newbie_chunks, newbie_positions = [], []
+        empty_id_emails, empty_id_positions = [], []
+        num_rows = 0
+
+        # category はチャンクごとにカテゴリが異なるため、object で読み込んで結合後に category にする
+        # （全体を読み込んだ場合と同じく、カテゴリは object）
+        dtypes = schema_dtypes(self.cols, self.newbie_ingest_cols())
+        reader = pd.read_csv(
+            csv_file,
+            names=list(asdict(self.cols).values()),
+            usecols=self.newbie_ingest_cols(),
+            dtype={col: object if dtype == "category" else dtype for col, dtype in dtypes.items()},
+            encoding="utf-8",
+            chunksize=chunksize)
+        for chunk in reader:
+            _positions = np.arange(num_rows, num_rows + chunk.shape[0])
+            num_rows += chunk.shape[0]
+            chunk_keys.append(pd.util.hash_pandas_object(chunk[key_cols], index=False).to_numpy())
+
+            _empty_id = chunk[self.cols.student_id].isna().to_numpy()
+            empty_id_emails.append(chunk[self.cols.email].to_numpy(dtype=object)[_empty_id])
+            empty_id_positions.append(_positions[_empty_id])
+
+            _newbie = (chunk[self.cols.cur_school_year] == 0).fillna(False).to_numpy(dtype=bool)
+            newbie_chunks.append(chunk[_newbie])
+            newbie_positions.append(_positions[_newbie])
+
+        # drop (student_id & name & prod_name) duplicated rows (across chunks)
+        _dup_flgs = (pd.Series(np.concatenate(chunk_keys)).duplicated().to_numpy() if chunk_keys
+                     else np.array([], dtype=bool))
+        newbie_chunks = [rows[~_dup_flgs[positions]] for rows, positions in zip(newbie_chunks, newbie_positions)]
+
+        # 仮ID用: 学籍番号が空の行のアドレスに出現順で番号を振る（NaN のアドレスも番号を1つ消費する）
+        _empty_id_emails = pd.unique(np.concatenate(empty_id_emails)[~_dup_flgs[np.concatenate(empty_id_positions)]]
+                                     if chunk_keys else np.array([], dtype=object))
+        email_nums = {email: num for num, email in enumerate(_empty_id_emails) if not pd.isna(email)}
+
+        self.data = (pd.concat(newbie_chunks) if newbie_chunks
+                     else pd.DataFrame(columns=self.newbie_ingest_cols())).astype(dtypes)
+        return pd.Series(email_nums, dtype=float)
 
 
     def get_student_id(self) -> pd.Series:
-        return self.data[self.join_target_col()].copy()
+        return lazy_copy(self.data[self.join_target_col()])
 
     def join_target_col(self) -> str:
         return self.cols.student_id
 
     def get_names(self) -> pd.Series:
-        return self.data[self.cols.student_name].copy()
+        return lazy_copy(self.data[self.cols.student_name])
 
     def calc_dict_buy_type(self) -> None:
         """calculate dict buy type
@@ -148,85 +344,155 @@ class CmsData:
 
         """
         # --------------------------------------------------------
-        # Get Unique Student ID
+        # Judge dict buy type by student_id (grouped, single pass)
+        # - 6辞書 > 3辞書 > 購入しない
+        # - NaN student_id never matches any order -> 購入しない
         # --------------------------------------------------------
-        uniq_student_id = self.get_student_id().unique()
-
-        # --------------------------------------------------------
-        # Judge dict buy type by student_id
-        # --------------------------------------------------------
-        dictype_by_uniq_students = []
-        for student_id in uniq_student_id:
-            student_orders = self.data[self.data[self.cols.student_id] == student_id].copy()
-
-            # judge dict buy type
-            if student_orders[self.cols.prod_name].isin([PROD_NAME_DIC6]).any():
-                # 6dic
-                dictype_by_uniq_students.append(self.dictype.DIC_6)
-            elif student_orders[self.cols.prod_name].isin([PROD_NAME_DIC3]).any():
-                # 3dic
-                dictype_by_uniq_students.append(self.dictype.DIC_3)
-            else:
-                # 購入しない
-                dictype_by_uniq_students.append(self.dictype.DIC_NONE)
-
-        co_student_id_col = 'co_student_id'
-        _df_id_dictype = pd.DataFrame(
-            data={
-                co_student_id_col: uniq_student_id,
-                DICTYPE_COL_NAME: dictype_by_uniq_students}
-            )
-
+        _student_id = self.data[self.cols.student_id]
+        _prod_name = self.data[self.cols.prod_name]
+        _has_dic = pd.DataFrame({
+            self.dictype.DIC_6: (_prod_name == PROD_NAME_DIC6).to_numpy(),
+            self.dictype.DIC_3: (_prod_name == PROD_NAME_DIC3).to_numpy(),
+        }).groupby(_student_id.to_numpy(), sort=False).any()
 
         # --------------------------------------------------------
         # Squash to 1 record per student_id
         # --------------------------------------------------------
-        squashed_data = self.data.copy()
-        squashed_data = squashed_data.drop_duplicates(subset=[self.cols.student_id])
+        squashed_data = self.data.drop_duplicates(subset=[self.cols.student_id])
+        squashed_data = squashed_data.reset_index(drop=True)
 
         # --------------------------------------------------------
         # Set dict buy type
         # --------------------------------------------------------
-        new_df = pd.merge(
-            left=squashed_data,
-            right=_df_id_dictype,
-            left_on=self.cols.student_id,
-            right_on=co_student_id_col,
-            how='left')
-        self.data = new_df.copy()
+        _squashed_id = squashed_data[self.cols.student_id]
+        _has_dic6 = _squashed_id.map(_has_dic[self.dictype.DIC_6]).eq(True)
+        _has_dic3 = _squashed_id.map(_has_dic[self.dictype.DIC_3]).eq(True)
+        co_student_id_col = 'co_student_id'
+        squashed_data[co_student_id_col] = _squashed_id
+        squashed_data[DICTYPE_COL_NAME] = np.select(
+            [_has_dic6.to_numpy(), _has_dic3.to_numpy()],
+            [self.dictype.DIC_6, self.dictype.DIC_3],
+            default=self.dictype.DIC_NONE)
+        self.data = squashed_data
 
-        # debug
-        self.data.to_csv('output-calcdictype.csv', index=False)
+        self.debug.dump('calcdictype', self.data)
 
 
 
-class DonguriAccount:
-    def __init__(self, exl_file):
-        self.load_prep(exl_file)
+@dataclass
+class DonguriAccCols:
+    user_name: str = col_dtype("ユーザー名", "string")
+    group_name: str = col_dtype("グループ名", "category")
+    temp_password: str = col_dtype("一時パスワード", "string")
+
+
+def fast_excel_engine() -> Optional[str]:
+    """read_excel engine faster than openpyxl, if available
+
+        - python-calamine (pandas>=2.2) が使える場合は 'calamine'
+        - それ以外は None（pandas の既定エンジン）
+    """
+    _pd_version = tuple(int(v) for v in pd.__version__.split('.')[:2])
+    if _pd_version >= (2, 2) and importlib.util.find_spec('python_calamine') is not None:
+        return 'calamine'
+    return None
 
-    def load_prep(self, exl_file) -> None:
-        self.data = pd.read_excel(exl_file)
+
+DONGURI_FILE_FORMATS = ["xlsx", "csv", "parquet"]
+
+
+def account_file_format(exl_file) -> str:
+    """format of a DONGURI account file from its name (path or file object with .name, 既定は xlsx)"""
+    name = str(exl_file) if isinstance(exl_file, (str, Path)) else str(getattr(exl_file, "name", ""))
+    suffix = Path(name).suffix.lower().lstrip(".")
+    return suffix if suffix in DONGURI_FILE_FORMATS else "xlsx"
+
+
+class DonguriAccount:
+    def __init__(self, exl_file, fast_load: bool = False):
+        self.cols = DonguriAccCols()
+        self.load_prep(exl_file, fast_load)
+
+    def load_prep(self, exl_file, fast_load: bool = False) -> None:
+        """load account list
+
+            - 形式はファイル名の拡張子で判定する（account_file_format）
+                - xlsx: DONGURI から配布されるアカウント一覧
+                - csv / parquet: `toolbox.py tmp-cnv -f csv|parquet` の出力（Excel の読み込みを省く）
+                - どの形式でも列の dtype は同じ（DonguriAccCols）
+            - fast_load: 受け渡しに使う列（ユーザー名 / グループ名 / 一時パスワード）だけを読み込み、
+              利用可能なら高速なエンジンを使う
+        """
+        usecols = list(asdict(self.cols).values()) if fast_load else None
+        fmt = account_file_format(exl_file)
+        if fmt == "csv":
+            self.data = pd.read_csv(exl_file, usecols=usecols, dtype=schema_dtypes(self.cols), encoding="utf-8")
+            return
+        if fmt == "parquet":
+            data = pd.read_parquet(exl_file, columns=usecols)
+            self.data = data.astype(schema_dtypes(self.cols, list(data.columns)))
+            return
+        if not fast_load:
+            self.data = pd.read_excel(exl_file, dtype=schema_dtypes(self.cols))
+            return
+
+        self.data = pd.read_excel(
+            exl_file,
+            usecols=usecols,
+            dtype=schema_dtypes(self.cols),
+            engine=fast_excel_engine())
+
+    def to_frames(self) -> Dict[str, pd.DataFrame]:
+        return {"data": self.data}
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame]) -> "DonguriAccount":
+        account = cls.__new__(cls)
+        account.cols = DonguriAccCols()
+        account.data = frames["data"]
+        return account
 
     def get_head(self, num: int) -> pd.DataFrame:
         self.used_acc_num = min(num, self.data.shape[0])
-        return self.data.head(num).copy()
+        self._rest_flgs = np.arange(self.data.shape[0]) >= self.used_acc_num
+        return lazy_copy(self.data.head(num))
+
+    def get_user_names(self) -> pd.Series:
+        return self.data[self.cols.user_name]
+
+    def get_by_user_names(self, user_names: List[Optional[str]], used_user_names: Set[str]) -> pd.DataFrame:
+        """account rows of user_names in the same order (None -> empty row)
+
+            - used_user_names（割り当て済みのユーザー名）は残りのアカウントから除外する
+            - 一覧にないユーザー名は ValueError（空の行にしない）
+        """
+        _user_names = self.get_user_names()
+        if _user_names.duplicated().any():
+            raise ValueError(f"{self.cols.user_name} of DONGURI accounts must be unique to use the ledger")
+        _unknown = {user_name for user_name in user_names if user_name is not None} - set(_user_names)
+        if _unknown:
+            raise ValueError(f"unknown {self.cols.user_name}: {', '.join(sorted(map(str, _unknown))[:5])}")
+        self._rest_flgs = ~_user_names.isin(used_user_names).to_numpy()
+        self.used_acc_num = int((~self._rest_flgs).sum())
+        _by_user_name = self.data.set_index(pd.Index(_user_names))
+        return _by_user_name.reindex(user_names).reset_index(drop=True)
 
     def get_rest_acc_num(self) -> int:
-        return (self.data.shape[0] - self.used_acc_num)
+        return int(self._rest_flgs.sum())
 
     def get_rest_of(self) -> pd.DataFrame:
-        return self.data.tail(self.get_rest_acc_num())
+        return self.data[self._rest_flgs]
 
 
 
 @dataclass
 class JiyuStuCols:
-    exam_id: str = "テスト番号"
-    course_name: str = "コース"
-    class_name: str = "クラス"
-    student_name: str = "氏　名"
-    student_name_kana: str = "フリガナ"
-    sex_type: str = "性別"
+    exam_id: str = col_dtype("テスト番号", "string")
+    course_name: str = col_dtype("コース", "category")
+    class_name: str = col_dtype("クラス", "category")
+    student_name: str = col_dtype("氏　名", "string")
+    student_name_kana: str = col_dtype("フリガナ", "string")
+    sex_type: str = col_dtype("性別", "category")
 
 
 class JiyuStudents:
@@ -235,19 +501,27 @@ class JiyuStudents:
         self.load_prep(csv_file)
 
     def load_prep(self, csv_file) -> None:
-        self.data = pd.read_csv(csv_file, encoding='utf-8')
-        _temp = self.data[self.get_name_col_name()].copy()
+        self.data = pd.read_csv(csv_file, dtype=schema_dtypes(self.cols), encoding='utf-8')
+        _temp = self.data[self.get_name_col_name()]
         _temp = _temp.str.strip() # remove white space
         _temp = _temp.str.replace("　", "") # remove ZENKAKU space
-        self.data[self.get_name_col_name()] = _temp.copy()
-        # CMSとマッチングできるように型をstrにする
-        self.data[self.join_target_col()] = self.data[self.join_target_col()].astype(str)
+        self.data[self.get_name_col_name()] = _temp
+
+    def to_frames(self) -> Dict[str, pd.DataFrame]:
+        return {"data": self.data}
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame]) -> "JiyuStudents":
+        students = cls.__new__(cls)
+        students.cols = JiyuStuCols()
+        students.data = frames["data"]
+        return students
 
     def get_student_test_id(self) -> pd.Series:
-        return self.data[self.join_target_col()].copy()
+        return lazy_copy(self.data[self.join_target_col()])
 
     def get_names(self) -> pd.Series:
-        return self.data[self.get_name_col_name()].copy()
+        return lazy_copy(self.data[self.get_name_col_name()])
 
     def get_name_col_name(self) -> str:
         return self.cols.student_name
@@ -256,22 +530,197 @@ class JiyuStudents:
         return self.cols.exam_id
 
 
+@dataclass
+class ExecutorOptions:
+    """options of ShiraishiExecutor
+
+        - debug_dir: 中間データ（デバッグ用）の保存先。None の場合は保存しない
+        - out_dir: 結果ファイルの出力先。None の場合はファイルに書かず、
+          `ShiraishiExecutor.export_buffers` にメモリ上のバイト列として保持する
+        - fast_export: 結果ファイルを write-only（ストリーミング）モードで、3ファイル並行に書き出す
+            - ヘッダーの書式（太字・罫線）は付かない
+        - fast_donguri_load: DONGURIアカウント一覧を必要な列だけ文字列として、高速なエンジンで読み込む
+        - ledger_path: アカウント割り当て台帳（SQLite）のパス。指定すると再実行時も同じ生徒には同じアカウントを割り当てる
+            - 学校のデータでテスト番号が重複している場合は LedgerDuplicatedExamId（実行前に確認する）
+        - newbie_only_ingest: CMSデータをチャンクごとに読み込み、読み込み時に新入生だけに絞り込む（結果は同じ）
+        - suggest_candidates: 紐付けに失敗した生徒とCMSデータの対応候補を名前・カナ・IDの近さで求め、
+          失敗した学生一覧に `自動マッチング候補` シートとして出力する
+        - low_memory: pandas の copy-on-write を有効にして読み込み・処理する（結果は同じ）
+            - 途中の DataFrame のコピーが遅延コピーになり、ピークメモリが減る
+        - cache_dir: 前処理済みの入力データのキャッシュ（src.frame_cache）の保存先。None の場合は使わない
+            - 同じ内容の入力ファイルは、2回目以降はパース・前処理をせずにキャッシュから読み込む
+        - backend: 重複除去・結合・振り分けに使う DataFrame backend（src.backends.BACKENDS、結果は同じ）
+            - 'polars': 行の選択をマルチスレッドで計算する（polars が必要）
+    """
+    debug_dir: Optional[str] = None
+    out_dir: Optional[str] = OUT_DIR
+    fast_export: bool = False
+    fast_donguri_load: bool = False
+    ledger_path: Optional[str] = None
+    newbie_only_ingest: bool = False
+    suggest_candidates: bool = False
+    low_memory: bool = False
+    cache_dir: Optional[str] = None
+    backend: str = "pandas"
+
+
+class ExecutionCancelled(Exception):
+    """ShiraishiExecutor.main_func was cancelled (cancel_event)"""
+
+
+class LedgerError(ValueError):
+    """the inputs cannot be used with the ledger (ExecutorOptions.ledger_path)"""
+
+
+class LedgerAccountMissing(LedgerError):
+    """an account recorded in the ledger is not in the DONGURI accounts (removed or renamed)"""
+
+
+class LedgerDuplicatedExamId(LedgerError):
+    """the school data has duplicated テスト番号 (the ledger is keyed on テスト番号)"""
+
+
 class ShiraishiExecutor:
-    def __init__(self, cms_file, dng6_file, dng3_file, jyg_file) -> None:
+    def __init__(self, cms_file, dng6_file, dng3_file, jyg_file, options: Optional[ExecutorOptions] = None) -> None:
+        self._options = options if options is not None else ExecutorOptions()
+        self._debug = DebugArtifacts(self._options.debug_dir)
+        self.profiler = StageProfiler()
+        self._backend = get_backend(self._options.backend)
+        _cache = FrameCache(self._options.cache_dir) if self._options.cache_dir is not None else None
+        _newbie_only = self._options.newbie_only_ingest
+        _fast_load = self._options.fast_donguri_load
+        with memory_mode(self._options):
+            self.__attach_inputs(
+                self.__load('load_cms_data', lambda: load_cached(
+                    _cache, 'cms', cms_file, {'newbie_only': _newbie_only},
+                    lambda f: CmsData(f, debug=self._debug, newbie_only=_newbie_only, backend=self._backend),
+                    CmsData.to_frames, lambda frames: CmsData.from_frames(frames, debug=self._debug))),
+                self.__load('load_donguri_6dic', lambda: load_cached(
+                    _cache, 'donguri', dng6_file, {'fast_load': _fast_load},
+                    lambda f: DonguriAccount(f, _fast_load), DonguriAccount.to_frames, DonguriAccount.from_frames)),
+                self.__load('load_donguri_3dic', lambda: load_cached(
+                    _cache, 'donguri', dng3_file, {'fast_load': _fast_load},
+                    lambda f: DonguriAccount(f, _fast_load), DonguriAccount.to_frames, DonguriAccount.from_frames)),
+                self.__load('load_jiyu_students', lambda: load_cached(
+                    _cache, 'jiyu_students', jyg_file, {},
+                    JiyuStudents, JiyuStudents.to_frames, JiyuStudents.from_frames)))
+
+    @classmethod
+    def from_loaded(cls, cms_data: CmsData, dongri_data_6dic: DonguriAccount, dongri_data_3dic: DonguriAccount,
+                    jiyu_students: JiyuStudents, options: Optional[ExecutorOptions] = None) -> "ShiraishiExecutor":
+        """create executor from already loaded (and prepped) inputs
+
+            - 入力はキャッシュされたオブジェクトの可能性があるため、浅いコピーを保持する
+                - main_func は data を置き換えるだけで、元のオブジェクト・DataFrameは変更しない
+            - 読み込み時に保存されていない 'loadprep'（デバッグ用）は main_func の開始時に保存する
+                - アプリは再描画のたびに executor を作るため、ここでは保存しない
+        """
+        executor = cls.__new__(cls)
+        executor._options = options if options is not None else ExecutorOptions()
+        executor._debug = DebugArtifacts(executor._options.debug_dir)
+        executor.profiler = StageProfiler()
+        executor._backend = get_backend(executor._options.backend)
+        _cms_data = copy.copy(cms_data)
+        _cms_data.debug = executor._debug
+        executor.__attach_inputs(
+            _cms_data,
+            copy.copy(dongri_data_6dic),
+            copy.copy(dongri_data_3dic),
+            copy.copy(jiyu_students))
+        executor._pending_loadprep = True
+        return executor
+
+    def __attach_inputs(self, cms_data: CmsData, dongri_data_6dic: DonguriAccount, dongri_data_3dic: DonguriAccount,
+                        jiyu_students: JiyuStudents) -> None:
         self._cms_cols = CmsDataCols()
-        self._cms_data = CmsData(cms_file)
-        self._dongri_data_6dic = DonguriAccount(dng6_file)
-        self._dongri_data_3dic = DonguriAccount(dng3_file)
+        self._cms_data = cms_data
+        self._dongri_data_6dic = dongri_data_6dic
+        self._dongri_data_3dic = dongri_data_3dic
         self._jiyu_stu_cols = JiyuStuCols()
-        self._jiyu_students = JiyuStudents(jyg_file)
-        Path(OUT_DIR).mkdir(parents=True, exist_ok=True)
-
-    def main_func(self):
-        self.__extract_newbee_from_cmsdata()
-        self.__calc_dic_buying_type()
-        self.__merge_cms_and_jyg()
-        self.__concat_donguri_acc_and_cmsjyg()
-        self.__export()
+        self._jiyu_students = jiyu_students
+        self.export_buffers: Dict[str, bytes] = {}
+        self._pending_loadprep = False
+
+    def __load(self, name: str, loader: Callable):
+        """run a loader as a profiled stage"""
+        with self.profiler.stage(name) as stage:
+            loaded = loader()
+            stage.rows_out = loaded.data.shape[0]
+        return loaded
+
+    def __run_stage(self, name: str, func: Callable[[], None], rows_in: Callable[[], int],
+                    rows_out: Callable[[], int]) -> None:
+        """run a pipeline stage as a profiled stage"""
+        with self.profiler.stage(name, rows_in=rows_in()) as stage:
+            func()
+            stage.rows_out = rows_out()
+
+    def __result_rows(self) -> int:
+        return (self.cms_jyg_acc.shape[0] + self.cms_jyg_no_buyer.shape[0]
+                + self.jyg_manual_operate.shape[0] + self._cms_newbee_unmatched.shape[0])
+
+    def preflight(self):
+        """pre-flight validation of the loaded inputs (src.preflight, main_func の実行前に呼び出す)"""
+        from src.preflight import preflight
+
+        return preflight(self._cms_data, self._dongri_data_6dic, self._dongri_data_3dic, self._jiyu_students)
+
+    def main_func(self, on_stage: Optional[Callable[[str, int, int], None]] = None,
+                  cancel_event: Optional[threading.Event] = None):
+        """run the pipeline stages
+
+            - on_stage: 各ステージの開始時に (ステージ名, 0始まりの番号, ステージ数) で呼び出される（進捗表示用）
+            - cancel_event: セットされると、次のステージの開始前に ExecutionCancelled を送出する
+                - 実行中のステージは最後まで実行する
+        """
+        if self._pending_loadprep:
+            self._debug.dump('loadprep', self._cms_data.data)
+            self._pending_loadprep = False
+        self._ledger = None
+        if self._options.ledger_path:
+            from src.ledger import AccountLedger  # sqlite3 は台帳を使う場合だけ読み込む
+
+            self.__check_ledger_inputs()
+
+            self._ledger = AccountLedger(self._options.ledger_path)
+        _cms_rows = lambda: self._cms_data.data.shape[0]
+        _merged_rows = lambda: self._merged_cms_jiyu.shape[0]
+        _stages = [
+            ('extract_newbee_from_cmsdata', self.__extract_newbee_from_cmsdata, _cms_rows, _cms_rows),
+            ('calc_dic_buying_type', self.__calc_dic_buying_type, _cms_rows, _cms_rows),
+            ('merge_cms_and_jyg', self.__merge_cms_and_jyg, lambda: self._jiyu_students.data.shape[0], _merged_rows),
+            ('concat_donguri_acc_and_cmsjyg', self.__concat_donguri_acc_and_cmsjyg, _merged_rows, self.__result_rows),
+        ]
+        if self._options.suggest_candidates:
+            _stages.append(('suggest_candidates', self.__suggest_candidates,
+                            lambda: self.jyg_manual_operate.shape[0], lambda: self.candidates.shape[0]))
+        _stages.append(('export', self.__export, self.__result_rows, lambda: self._exported_rows))
+        try:
+            with memory_mode(self._options):
+                for index, (name, func, rows_in, rows_out) in enumerate(_stages):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ExecutionCancelled(f"cancelled before {name}")
+                    if on_stage is not None:
+                        on_stage(name, index, len(_stages))
+                    self.__run_stage(name, func, rows_in, rows_out)
+        finally:
+            self._debug.close()
+            if self._ledger is not None:
+                self._ledger.close()
+
+    def __check_ledger_inputs(self) -> None:
+        """reject inputs that would make the ledger unstable (before any stage runs)
+
+            - 台帳は (テスト番号, 辞書タイプ) ごとに1つのアカウントを記録するため、
+              テスト番号が重複していると2人目に割り当てたアカウントが記録されず、再実行で未使用に戻ってしまう
+        """
+        _exam_id = self._jiyu_students.data[self._jiyu_stu_cols.exam_id]
+        _duplicated = _exam_id[_exam_id.notna() & _exam_id.duplicated(keep=False)]
+        if not _duplicated.empty:
+            _examples = ", ".join(map(str, _duplicated.drop_duplicates().head(5)))
+            raise LedgerDuplicatedExamId(
+                f"{_duplicated.nunique()} {self._jiyu_stu_cols.exam_id} are duplicated in the school data "
+                f"({_examples}); fix them before using the ledger")
 
     def __extract_newbee_from_cmsdata(self):
         """## 1. Extract Newbee from CmsData
@@ -290,9 +739,10 @@ class ShiraishiExecutor:
     def __merge_cms_and_jyg(self):
         """## MERGE - CMS and Juyugaoka Students
         """
-        self._merged_cms_jiyu = pd.merge(self._jiyu_students.data,
-                                    self._cms_data.data,
-                                    how='left',
+        # 空のテスト番号・学籍番号同士はマッチングさせない
+        _cms_data = self._cms_data.data
+        self._merged_cms_jiyu = self._backend.merge_left(self._jiyu_students.data,
+                                    _cms_data[_cms_data[self._cms_data.join_target_col()].notna()],
                                     left_on=self._jiyu_students.join_target_col(),
                                     right_on=self._cms_data.join_target_col())
 
@@ -300,12 +750,11 @@ class ShiraishiExecutor:
         __target_cols = [self._jiyu_stu_cols.exam_id, self._jiyu_stu_cols.course_name, self._jiyu_stu_cols.class_name, self._jiyu_stu_cols.student_name,
                          self._cms_cols.id, self._cms_cols.student_id, self._cms_cols.student_name, DICTYPE_COL_NAME]
         # 2021 sample data ==> __target_cols = ['テスト番号', '合格学科', 'クラス２', '出席番号', '氏　名', 'id', '学籍番号', '生徒名', '教科書タイトル', '副教材タイプ']
-        self._merged_cms_jiyu = self._merged_cms_jiyu[__target_cols]
-
         # '副教材タイプ' fill na -> BuyingDicType.NULL
-        self._merged_cms_jiyu[DICTYPE_COL_NAME].fillna(buying_dic_type.NULL, inplace=True)
+        self._merged_cms_jiyu = self._merged_cms_jiyu[__target_cols].assign(
+            **{DICTYPE_COL_NAME: self._merged_cms_jiyu[DICTYPE_COL_NAME].fillna(buying_dic_type.NULL)})
 
-        self._merged_cms_jiyu.to_csv('output-merged.csv')
+        self._debug.dump('merged', self._merged_cms_jiyu)
 
 
     def __concat_donguri_acc_and_cmsjyg(self):
@@ -326,10 +775,10 @@ class ShiraishiExecutor:
         # 1. Checking
         # - `[memo]` 名前マッチングからテスト番号-学籍番号マッチングに変更することで、失敗数が84件から18件に減った。
         # Split CMS-JYG into DIC_6/DIC_3/DIC_NONE
-        __merged_cms_jiyu_d6 = self._merged_cms_jiyu[self._merged_cms_jiyu[DICTYPE_COL_NAME] == buying_dic_type.DIC_6].copy()
-        __merged_cms_jiyu_d3 = self._merged_cms_jiyu[self._merged_cms_jiyu[DICTYPE_COL_NAME] == buying_dic_type.DIC_3].copy()
-        __merged_cms_jiyu_dN = self._merged_cms_jiyu[self._merged_cms_jiyu[DICTYPE_COL_NAME] == buying_dic_type.DIC_NONE].copy()
-        __merged_cms_jiyu_NaN = self._merged_cms_jiyu[self._merged_cms_jiyu[DICTYPE_COL_NAME] == buying_dic_type.NULL].copy()
+        __merged_cms_jiyu_d6, __merged_cms_jiyu_d3, __merged_cms_jiyu_dN, __merged_cms_jiyu_NaN = [
+            lazy_copy(_rows) for _rows in self._backend.split(
+                self._merged_cms_jiyu, DICTYPE_COL_NAME,
+                [buying_dic_type.DIC_6, buying_dic_type.DIC_3, buying_dic_type.DIC_NONE, buying_dic_type.NULL])]
 
         # debug
         print()
@@ -352,10 +801,16 @@ class ShiraishiExecutor:
         print(f'手動オペレーション対象者数 = {__merged_cms_jiyu_NaN.shape[0]} / {_total_row}')
         print()
 
+        _id_issues = self._cms_data.id_issues
+        print(f'== 学籍番号の仮ID割り振りで網羅できないケース（CMSデータ全体）')
+        print(f'生徒間で重複している学籍番号数 = {_id_issues.duplicated_student_ids[self._cms_cols.student_id].nunique()}')
+        print(f'学籍番号が空で共有されているメールアドレス数 = {_id_issues.shared_empty_id_emails[self._cms_cols.email].nunique()}')
+        print()
+
         # -------------------------------------------------
         # 2. RESULTS1 - Attach account info to students rows
         # dic 6
-        _acc_rows_d6 = self._dongri_data_6dic.get_head(__merged_cms_jiyu_d6.shape[0])
+        _acc_rows_d6 = self.__assign_accounts(__merged_cms_jiyu_d6, self._dongri_data_6dic, buying_dic_type.DIC_6)
         # -- concat cols は index が一致するものをつなぐので整えておく
         __merged_cms_jiyu_d6.reset_index(drop=True, inplace=True)
         _acc_rows_d6.reset_index(drop=True, inplace=True)
@@ -363,22 +818,33 @@ class ShiraishiExecutor:
 
 
         # dic 3
-        _acc_rows_d3 = self._dongri_data_3dic.get_head(__merged_cms_jiyu_d3.shape[0])
+        _acc_rows_d3 = self.__assign_accounts(__merged_cms_jiyu_d3, self._dongri_data_3dic, buying_dic_type.DIC_3)
         # -- concat cols は index が一致するものをつなぐので整えておく
         __merged_cms_jiyu_d3.reset_index(drop=True, inplace=True)
         _acc_rows_d3.reset_index(drop=True, inplace=True)
         _cms_jyg_acc_d3 = pd.concat([__merged_cms_jiyu_d3, _acc_rows_d3], axis=1) # axis=columns,1
 
+        # アカウント不足（割り当てるアカウントがなかった生徒）
+        self._account_shortage = {
+            buying_dic_type.DIC_6: __merged_cms_jiyu_d6.shape[0] - int(_acc_rows_d6.notna().any(axis=1).sum()),
+            buying_dic_type.DIC_3: __merged_cms_jiyu_d3.shape[0] - int(_acc_rows_d3.notna().any(axis=1).sum()),
+        }
+
         # dic None
         # -- 不要
 
         # Concat vertically
         self.cms_jyg_acc = pd.concat([_cms_jyg_acc_d6, _cms_jyg_acc_d3], axis=0) # axis=rows:0
-        self.cms_jyg_acc.fillna(value="アカウント不足", inplace=True)
+        # category の列は埋める値をカテゴリに追加しておく
+        _shortage = "アカウント不足"
+        for _col in self.cms_jyg_acc.select_dtypes("category").columns:
+            if _shortage not in self.cms_jyg_acc[_col].cat.categories:
+                self.cms_jyg_acc[_col] = self.cms_jyg_acc[_col].cat.add_categories([_shortage])
+        self.cms_jyg_acc.fillna(value=_shortage, inplace=True)
 
         # -------------------------------------------------
         # 3. RESULTS2 - No Buying data
-        self.cms_jyg_no_buyer = __merged_cms_jiyu_dN.copy()
+        self.cms_jyg_no_buyer = lazy_copy(__merged_cms_jiyu_dN)
         self.cms_jyg_no_buyer.reset_index(drop=True, inplace=True)
 
         # -------------------------------------------------
@@ -390,7 +856,7 @@ class ShiraishiExecutor:
             self._jiyu_stu_cols.class_name,
             self._jiyu_stu_cols.student_name
         ]
-        self.jyg_manual_operate = __merged_cms_jiyu_NaN[_jyg_target_cols].copy()
+        self.jyg_manual_operate = lazy_copy(__merged_cms_jiyu_NaN[_jyg_target_cols])
         # 2021 sample --> self.jyg_manual_operate = __merged_cms_jiyu_NaN[['テスト番号', '合格学科', 'クラス２', '出席番号', '氏　名']].copy()
         self.jyg_manual_operate.reset_index(drop=True, inplace=True)
 
@@ -400,7 +866,8 @@ class ShiraishiExecutor:
         _successfully_matched_ids.extend(self.cms_jyg_acc[self._cms_cols.student_id].values)
         _successfully_matched_ids.extend(self.cms_jyg_no_buyer[self._cms_cols.student_id].values)
         # -- これを含まないCMSデータだけ取得
-        self._cms_newbee_unmatched = self._cms_data.data[~self._cms_data.data[self._cms_cols.student_id].isin(_successfully_matched_ids)].copy()
+        self._cms_newbee_unmatched = lazy_copy(self._cms_data.data[
+            ~self._backend.isin(self._cms_data.data[self._cms_cols.student_id], _successfully_matched_ids)])
         __target_cols = [
             self._cms_cols.id,
             self._cms_cols.student_id,
@@ -410,6 +877,129 @@ class ShiraishiExecutor:
         self._cms_newbee_unmatched = self._cms_newbee_unmatched[__target_cols]
         self._cms_newbee_unmatched.reset_index(drop=True, inplace=True)
 
+    def __suggest_candidates(self):
+        """## SUGGEST - Candidates for Manual Operate Data
+
+            - 紐付けに失敗した生徒（jyg）ごとに、紐付けされなかった新入生のCMSデータから候補を順位付けする
+            - 名前・カナの類似度、テスト番号と学籍番号の編集距離（入力ミス）で採点する
+        """
+        from src.matching import suggest_candidates
+
+        _jyg_kana = self.__lookup(self._jiyu_students.data, self._jiyu_stu_cols.exam_id,
+                                  self._jiyu_stu_cols.student_name_kana)
+        _cms_kana = self.__lookup(self._cms_data.data, self._cms_cols.student_id, self._cms_cols.student_name_kana)
+        _kana_col = 'kana'
+        _jyg = self.jyg_manual_operate.assign(
+            **{_kana_col: self.jyg_manual_operate[self._jiyu_stu_cols.exam_id].map(_jyg_kana)})
+        _cms = self._cms_newbee_unmatched.assign(
+            **{_kana_col: self._cms_newbee_unmatched[self._cms_cols.student_id].map(_cms_kana)})
+
+        _matched = suggest_candidates(
+            _jyg, _cms,
+            left_id=self._jiyu_stu_cols.exam_id, left_name=self._jiyu_stu_cols.student_name, left_kana=_kana_col,
+            right_id=self._cms_cols.student_id, right_name=self._cms_cols.student_name, right_kana=_kana_col)
+
+        _jyg_cols = [self._jiyu_stu_cols.exam_id, self._jiyu_stu_cols.student_name]
+        _cms_cols = [self._cms_cols.id, self._cms_cols.student_id, self._cms_cols.student_name, DICTYPE_COL_NAME]
+        self.candidates = pd.concat([
+            _jyg[_jyg_cols].iloc[_matched['left_pos']].reset_index(drop=True),
+            _matched[['rank', 'score']].rename(columns={'rank': '候補順位', 'score': 'スコア'}),
+            _cms[_cms_cols].iloc[_matched['right_pos']].reset_index(drop=True),
+            _matched[['name_similarity', 'kana_similarity', 'id_distance']].rename(columns={
+                'name_similarity': '名前類似度', 'kana_similarity': 'カナ類似度', 'id_distance': 'ID編集距離'}),
+        ], axis=1)
+
+    @staticmethod
+    def __lookup(data: pd.DataFrame, key_col: str, value_col: str) -> pd.Series:
+        """key -> value (first row per key), empty if value_col does not exist"""
+        if value_col not in data.columns:
+            return pd.Series(dtype=object)
+        return data.drop_duplicates(subset=[key_col]).set_index(key_col)[value_col]
+
+    def summary(self) -> Dict[str, int]:
+        """row counts of the results (after main_func)"""
+        return {
+            'students': int(self._merged_cms_jiyu.shape[0]),
+            'buyers_6dic': int((self.cms_jyg_acc[DICTYPE_COL_NAME] == buying_dic_type.DIC_6).sum()),
+            'buyers_3dic': int((self.cms_jyg_acc[DICTYPE_COL_NAME] == buying_dic_type.DIC_3).sum()),
+            'no_buyers': int(self.cms_jyg_no_buyer.shape[0]),
+            'manual_operate': int(self.jyg_manual_operate.shape[0]),
+            'cms_unmatched': int(self._cms_newbee_unmatched.shape[0]),
+            'account_shortage_6dic': self._account_shortage[buying_dic_type.DIC_6],
+            'account_shortage_3dic': self._account_shortage[buying_dic_type.DIC_3],
+            'rest_accounts_6dic': self._dongri_data_6dic.get_rest_acc_num(),
+            'rest_accounts_3dic': self._dongri_data_3dic.get_rest_acc_num(),
+        }
+
+    def __assign_accounts(self, students: pd.DataFrame, accounts: DonguriAccount, dic_type: str) -> pd.DataFrame:
+        """DONGURI account rows for students (same order as students)
+
+            - 台帳なし: アカウント一覧の先頭から順に割り当てる
+            - 台帳あり:
+                - 台帳に記録済みの生徒（テスト番号）には同じアカウントを割り当てる
+                - 新しい生徒には、台帳で未使用のアカウントを一覧の先頭から割り当てて記録する
+                - 足りない場合は空の行（→ アカウント不足）
+                - 台帳への書き込みは新しい生徒・学籍番号が変わった生徒だけ（結果ファイルは全員分を出力する）
+                - 台帳のアカウントがアカウント一覧にない場合は LedgerAccountMissing
+        """
+        if self._ledger is None:
+            return accounts.get_head(students.shape[0])
+
+        _exam_ids = students[self._jiyu_stu_cols.exam_id].reset_index(drop=True)
+        _student_ids = students[self._cms_cols.student_id].reset_index(drop=True)
+        _recorded = self._ledger.lookup(dic_type)
+        _used_user_names = self._ledger.used_user_names(dic_type)
+
+        _assigned = _exam_ids.map({exam_id: user_name for exam_id, (user_name, _) in _recorded.items()}).astype(object)
+        _is_new = _assigned.isna()
+        _all_user_names = accounts.get_user_names()
+
+        # 台帳のアカウントが今回のアカウント一覧にない（アカウント不足として扱うと、配布済みのアカウントを見落とす）
+        _missing = ~_is_new & ~_assigned.isin(_all_user_names)
+        if _missing.any():
+            _examples = ", ".join(f"{exam_id} -> {user_name}" for exam_id, user_name
+                                  in zip(_exam_ids[_missing].head(5), _assigned[_missing].head(5)))
+            raise LedgerAccountMissing(
+                f"{int(_missing.sum())} accounts recorded in the ledger ({dic_type}) are not in the DONGURI accounts "
+                f"(テスト番号 -> ユーザー名: {_examples})")
+
+        _pool = _all_user_names[~_all_user_names.isin(_used_user_names)].head(int(_is_new.sum())).tolist()
+        _assigned[_is_new] = _pool + [None] * (int(_is_new.sum()) - len(_pool))
+
+        # 台帳に書き込むのは、新しく割り当てた生徒と学籍番号が変わった生徒だけ
+        _recorded_student_ids = _exam_ids.map({exam_id: student_id for exam_id, (_, student_id) in _recorded.items()})
+        _is_changed = ~_is_new & (_recorded_student_ids.astype("string").fillna("")
+                                  != _student_ids.astype("string").fillna("")).to_numpy()
+        _to_record = _assigned.notna() & (_is_new | _is_changed)
+        self._ledger.record(dic_type, zip(_exam_ids[_to_record], _student_ids[_to_record], _assigned[_to_record]))
+
+        # 台帳に別の辞書タイプで記録されている生徒（購入内容が変わった生徒）
+        _recorded_types = self._ledger.assigned_exam_ids()
+        _changed = _exam_ids[_is_new].map(
+            lambda exam_id: len(_recorded_types.get(exam_id, set()) - {dic_type}) > 0).astype(bool)
+        print(f'== 台帳（{dic_type}）: 既存の割り当て = {int((~_is_new).sum())}, 新規の割り当て = {len(_pool)}, '
+              f'学籍番号が変わった生徒 = {int(_is_changed.sum())}, 辞書タイプが変わった生徒 = {int(_changed.sum())}')
+
+        return accounts.get_by_user_names(_assigned.tolist(), _used_user_names | set(_pool))
+
+    def result_workbooks(self) -> Dict[str, Dict[str, pd.DataFrame]]:
+        """result sheets (after main_func): file name -> sheet name -> data"""
+        return {
+            FN_RESULT: {
+                SHN_RESULT_BUYER: self.cms_jyg_acc,
+                SHN_RESULT_NO_BUYER: self.cms_jyg_no_buyer,
+            },
+            FN_FAILED_STUDENTS: {
+                SHN_FAILED_STUDENTS_JYG: self.jyg_manual_operate,
+                SHN_FAILED_STUDENTS_CMS: self._cms_newbee_unmatched,
+                **({SHN_FAILED_STUDENTS_CANDIDATES: self.candidates} if self._options.suggest_candidates else {}),
+            },
+            FN_REST_DONGURI_ACC: {
+                SHN_REST_DONGURI_ACC_6DIC: self._dongri_data_6dic.get_rest_of(),
+                SHN_REST_DONGURI_ACC_3DIC: self._dongri_data_3dic.get_rest_of(),
+            },
+        }
+
     def __export(self):
         """## EXPORT
 
@@ -432,19 +1022,74 @@ class ShiraishiExecutor:
                     - Sheet: `6辞書アカウント` - RESULTS4
                     - Sheet: `3辞書アカウント` - RESULTS4
 
+            ### Destination
+                - `options.out_dir` が指定されている場合: `{out_dir}/{ファイル名}`
+                - `options.out_dir` が None の場合: `self.export_buffers[ファイル名]` (bytes)
+
             https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.to_excel.html?highlight=to_excel#pandas.DataFrame.to_excel
         """
-        with pd.ExcelWriter(FP_RESULT) as writer:
-            self.cms_jyg_acc.to_excel(writer, sheet_name=SHN_RESULT_BUYER, index=False)
-            self.cms_jyg_no_buyer.to_excel(writer, sheet_name=SHN_RESULT_NO_BUYER, index=False)
+        workbooks = self.result_workbooks()
+
+        self._exported_rows = sum(data.shape[0] for sheets in workbooks.values() for data in sheets.values())
+
+        out_dir = self._options.out_dir
+        if out_dir is not None:
+            Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+        def _export_one(file_name: str, sheets: Dict[str, pd.DataFrame]) -> Optional[bytes]:
+            _write = write_workbook_fast if self._options.fast_export else write_workbook
+            if out_dir is not None:
+                _write(Path(out_dir) / file_name, sheets)
+                return None
+            buffer = io.BytesIO()
+            _write(buffer, sheets)
+            return buffer.getvalue()
+
+        if self._options.fast_export:
+            # 3ファイルは互いに独立しているので並行に書き出す
+            with ThreadPoolExecutor(max_workers=len(workbooks), thread_name_prefix="export") as pool:
+                futures = {fn: pool.submit(_export_one, fn, sheets) for fn, sheets in workbooks.items()}
+                results = {fn: future.result() for fn, future in futures.items()}
+        else:
+            results = {fn: _export_one(fn, sheets) for fn, sheets in workbooks.items()}
+
+        self.export_buffers = {fn: data for fn, data in results.items() if data is not None}
+
+
+
+def write_workbook(dest, sheets: Dict[str, pd.DataFrame]) -> None:
+    """write sheets (sheet name -> data) into an Excel workbook
+
+        - dest: file path or binary buffer
+    """
+    with pd.ExcelWriter(dest) as writer:
+        for sheet_name, data in sheets.items():
+            data.to_excel(writer, sheet_name=sheet_name, index=False)
 
-        with pd.ExcelWriter(FP_FAILED_STUDENTS) as writer:
-            self.jyg_manual_operate.to_excel(writer, sheet_name=SHN_FAILED_STUDENTS_JYG, index=False)
-            self._cms_newbee_unmatched.to_excel(writer, sheet_name=SHN_FAILED_STUDENTS_CMS, index=False)
 
-        with pd.ExcelWriter(FP_REST_DONGURI_ACC) as writer:
-            self._dongri_data_6dic.get_rest_of().to_excel(writer, sheet_name=SHN_REST_DONGURI_ACC_6DIC, index=False)
-            self._dongri_data_3dic.get_rest_of().to_excel(writer, sheet_name=SHN_REST_DONGURI_ACC_3DIC, index=False)
+# write_workbook_fast で一度に object 型へ変換する行数
+FAST_EXPORT_CHUNK_ROWS: Final[int] = 10_000
+
+
+def write_workbook_fast(dest, sheets: Dict[str, pd.DataFrame]) -> None:
+    """write sheets into an Excel workbook with openpyxl write-only mode
+
+        - write_workbook と同じ値・シート構成（ヘッダーの書式は付かない）
+        - セルオブジェクトを保持せず行ごとに書き出すので、メモリ使用量が行数に比例しない
+        - dest: file path or binary buffer
+    """
+    from openpyxl import Workbook
+
+    book = Workbook(write_only=True)
+    for sheet_name, data in sheets.items():
+        sheet = book.create_sheet(title=sheet_name)
+        sheet.append([str(col) for col in data.columns])
+        for start in range(0, data.shape[0], FAST_EXPORT_CHUNK_ROWS):
+            _chunk = data.iloc[start:start + FAST_EXPORT_CHUNK_ROWS].astype(object)
+            _chunk = _chunk.where(_chunk.notna(), None)
+            for row in _chunk.itertuples(index=False, name=None):
+                sheet.append(row)
+    book.save(dest)
 
 
 
@@ -454,20 +1099,37 @@ class StatsManager:
         - 統計情報を管理する
         - 出力する
     """
-    def __init__(self):
+    def __init__(self, cache_dir: Optional[str] = None):
         self._cms_cols = CmsDataCols()
         self._stats = {}
+        self._cache = FrameCache(cache_dir) if cache_dir is not None else None
+
+    def stats_cols(self) -> List[str]:
+        """columns used by the statistics (読み込む列)"""
+        return [self._cms_cols.student_id, self._cms_cols.student_name, self._cms_cols.email, self._cms_cols.prod_name]
 
     def load_cms_data(self, cms_path: str):
         """load cms data
 
             - cms_path: str
                 - cms data path
+            - 統計に使う列だけを読み込み、アプリと同じ前処理（重複除去・生徒名の正規化・仮ID）だけを行う
+            - 辞書の購入タイプの判定（calc_dict_buy_type）も読み込み時に行い、前処理済みのデータと一緒にキャッシュする
         """
-        cms_file = open(cms_path, 'rb')
-        cms_data_obj = CmsData(cms_file)
+        with open(cms_path, 'rb') as cms_file:
+            self._cms_data, self._classified_data = load_cached(
+                self._cache, 'cms_stats', cms_file, {'usecols': self.stats_cols()},
+                self.__load_and_classify,
+                lambda loaded: {**loaded[0].to_frames(), 'classified': loaded[1]},
+                lambda frames: (CmsData.from_frames(frames), frames['classified']))
         self._stats['cms_path'] = cms_path
-        self._stats['cms_data'] = cms_data_obj.data
+
+    def __load_and_classify(self, cms_file) -> Tuple[CmsData, pd.DataFrame]:
+        """prepped cms data + dict buy type of all students (calc_dict_buy_type)"""
+        cms_data = CmsData(cms_file, usecols=self.stats_cols())
+        classified = copy.copy(cms_data)
+        classified.calc_dict_buy_type()
+        return cms_data, classified.data
 
     def get_stats(self) -> dict:
         """get statistics
@@ -480,10 +1142,9 @@ class StatsManager:
     def aggregate_cms_data(self):
         """aggregate cms data
 
-            - cms_data: pd.DataFrame
-                - cms data
+            - 学籍番号 × 生徒名 でまとめた1回の集計から、各統計を求める
         """
-        cms_data = self._stats['cms_data']
+        cms_data = self._cms_data.data
 
         # --------------------------------------------------
         # Contents
@@ -494,41 +1155,60 @@ class StatsManager:
         # 5. 辞書非購入者総数（S1 - (A+B) and S2 - (A+B)）
         # 6. 辞書非購入者総数（購入履歴から抽出ロジックを実装ーアプリで使ってるもの）
         # --------------------------------------------------
-        # 1. 全生徒数（学籍番号ユニーク） - S1
-        unique_sid_arr = cms_data[self._cms_cols.student_id].unique()
-        self._stats['S1'] = len(unique_sid_arr)
-        # print('[INFO] 全生徒数（学籍番号ユニーク）: {}'.format(len(unique_sid_arr)))
+        # 商品名の判定はカテゴリ（商品の種類）ごとに1回だけ行う
+        _prod_name = cms_data[self._cms_cols.prod_name].astype("category")
+        _categories = _prod_name.cat.categories.astype(str)
+        _codes = _prod_name.cat.codes.to_numpy()
+        _is_dic6 = np.append(_categories.str.contains(PROD_NAME_DIC6, regex=False), False)[_codes]
+        _is_dic3 = np.append(_categories.str.contains(PROD_NAME_DIC3, regex=False), False)[_codes]
+
+        # 学籍番号 × 生徒名 ごとの注文数（NaN もひとつの値として数える）
+        _grouped = pd.DataFrame({'dic6': _is_dic6, 'dic3': _is_dic3}).groupby(
+            [cms_data[self._cms_cols.student_id].to_numpy(), cms_data[self._cms_cols.student_name].to_numpy()],
+            dropna=False, sort=False).sum()
 
+        # 1. 全生徒数（学籍番号ユニーク） - S1
+        self._stats['S1'] = _grouped.index.get_level_values(0).nunique(dropna=False)
         # 2. 全生徒数（名前ユニーク） - S2
-        unique_sname_arr = cms_data[self._cms_cols.student_name].unique()
-        self._stats['S2'] = len(unique_sname_arr)
-        # print('[INFO] 全生徒数（名前ユニーク）: {}'.format(len(unique_sname_arr)))
-
+        self._stats['S2'] = _grouped.index.get_level_values(1).nunique(dropna=False)
         # 2.5. 全生徒数（学籍番号＆名前ユニーク） - S3
-        _df = cms_data.copy()
-        unique_id_name_arr = _df.drop_duplicates(subset=[self._cms_cols.student_id, self._cms_cols.student_name])
-        self._stats['S3'] = unique_id_name_arr.shape[0]
-        print('[INFO] 全生徒数（学籍番号＆名前ユニーク）: {}'.format(unique_id_name_arr.shape[0]))
+        self._stats['S3'] = _grouped.shape[0]
+        print('[INFO] 全生徒数（学籍番号＆名前ユニーク）: {}'.format(self._stats['S3']))
 
         # 3. 6辞書購入者総数 - A
-        dic6_orders = cms_data[cms_data[self._cms_cols.prod_name].str.contains(PROD_NAME_DIC6, regex=False)]
-        self._stats['A'] = dic6_orders.shape[0]
-        print('[INFO] 6辞書購入者総数: {}'.format(dic6_orders.shape[0]))
+        self._stats['A'] = int(_grouped['dic6'].sum())
+        print('[INFO] 6辞書購入者総数: {}'.format(self._stats['A']))
 
         # 4. 3辞書購入者総数 - B
-        dic3_orders = cms_data[cms_data[self._cms_cols.prod_name].str.contains(PROD_NAME_DIC3, regex=False)]
-        self._stats['B'] = dic3_orders.shape[0]
-        print('[INFO] 3辞書購入者総数: {}'.format(dic3_orders.shape[0]))
+        self._stats['B'] = int(_grouped['dic3'].sum())
+        print('[INFO] 3辞書購入者総数: {}'.format(self._stats['B']))
 
         # 5. 辞書非購入者総数（S1 - (A+B) and S2 - (A+B)）
         self._stats['S1_minus_A_plus_B'] = self._stats['S1'] - (self._stats['A'] + self._stats['B'])
         self._stats['S2_minus_A_plus_B'] = self._stats['S2'] - (self._stats['A'] + self._stats['B'])
         self._stats['S3_minus_A_plus_B'] = self._stats['S3'] - (self._stats['A'] + self._stats['B'])
-
-        # print('[INFO] 辞書非購入者総数: S1 - (A+B): {}'.format(self._stats['S1_minus_A_plus_B']))
-        # print('[INFO] 辞書非購入者総数: S2 - (A+B): {}'.format(self._stats['S2_minus_A_plus_B']))
         print('[INFO] 辞書非購入者総数: S3 - (A+B): {}'.format(self._stats['S3_minus_A_plus_B']))
 
         # 6. 辞書非購入者総数（購入履歴から抽出ロジックを実装ーアプリで使ってるもの）
-        print("[INFO] 辞書非購入者総数（購入履歴から抽出ロジックを実装ーアプリで使ってるもの） - NotImplemented")
+        # - アプリと同じ判定（CmsData.calc_dict_buy_type）を全学年の生徒に適用した結果（読み込み時に判定済み）
+        _dictypes = self._classified_data[DICTYPE_COL_NAME].value_counts()
+        self._stats['APP_DIC6'] = int(_dictypes.get(buying_dic_type.DIC_6, 0))
+        self._stats['APP_DIC3'] = int(_dictypes.get(buying_dic_type.DIC_3, 0))
+        self._stats['APP_DIC_NONE'] = int(_dictypes.get(buying_dic_type.DIC_NONE, 0))
+        print('[INFO] 辞書非購入者総数（購入履歴から抽出ロジックを実装ーアプリで使ってるもの）: {}'.format(
+            self._stats['APP_DIC_NONE']))
 
+
+def aggregate_cms_files(cms_paths: List[str], cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """statistics of each CMS data file
+
+        - cache_dir: 前処理済みの入力データのキャッシュの保存先（None の場合は使わない）
+        - return: 1 row per file (columns = StatsManager.get_stats() の項目)
+    """
+    rows = []
+    for cms_path in cms_paths:
+        stats_manager = StatsManager(cache_dir)
+        stats_manager.load_cms_data(cms_path)
+        stats_manager.aggregate_cms_data()
+        rows.append(stats_manager.get_stats())
+    return pd.DataFrame(rows)
@@ -0,0 +1,214 @@
+"""Frame Cache (content-addressed, on disk)
+
+    - パース・前処理済みの入力データ（DataFrame）を、入力ファイルの内容ハッシュをキーにディスクに保存する
+        - キー: 種類（kind）・入力のバイト列の sha256・読み込みのパラメーター・コードのバージョン
+        - コードのバージョンは前処理のモジュール（src/executor.py, src/backends.py）の内容ハッシュと
+          pandas のバージョン（前処理が変わればキーも変わる）
+    - 形式: parquet（pyarrow が必要。ない場合はキャッシュに保存しない）
+        - parquet にして読み戻した結果が元の DataFrame と一致しない入力（型が混在した object 列など）は
+          キャッシュしない（毎回パースする。キャッシュから読んだ結果はパースした結果と常に同じ）
+            - 次回から保存を試さないように、キャッシュできない入力として記録する
+        - pickle は使わない（共有ディレクトリのファイルを読み込むだけでコードが実行されるため）
+    - 生徒の氏名・メールアドレスを含むため、キャッシュのディレクトリは本人だけが読み書きできる（0700）
+    - 上限サイズを超えたら、最後に使われた日時が古いエントリから削除する（LRU）
+    - CLI（toolbox.py）とアプリで同じディレクトリを共有できる（書き込みは一時ディレクトリから rename する）
+    - pandas は読み書きするときに読み込む（toolbox.py の cache コマンドなどは pandas を読み込まない）
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import time
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, TypeVar
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+FRAME_CACHE_DIR = "./cache/frames"
+FRAME_CACHE_MAX_BYTES = 1024 * 2 ** 20
+FRAME_CACHE_FORMAT_VERSION = 3
+DIGEST_BLOCK_BYTES = 1024 * 1024
+_META_FILE = "meta.json"
+_UNCACHEABLE = "uncacheable"   # meta.json の format: キャッシュできない入力（frames なし）
+# 前処理（load_prep）が依存するモジュール（前処理を別のモジュールに移した場合はここに追加する）
+_PREP_MODULE_PATHS = [Path(__file__).resolve().parent / name for name in ("executor.py", "backends.py")]
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=None)
+def code_version() -> str:
+    """version of the preparation code (_PREP_MODULE_PATHS + pandas + cache format)"""
+    import pandas as pd
+
+    digest = hashlib.sha256()
+    for path in _PREP_MODULE_PATHS:
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    digest.update(f"{pd.__version__}/{FRAME_CACHE_FORMAT_VERSION}".encode())
+    return digest.hexdigest()
+
+
+def content_digest(content: bytes) -> str:
+    """sha256 of the input bytes (streamlit_app の file_digest と同じ)"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def stream_digest(source) -> str:
+    """sha256 of a file path or a seekable binary file, read in chunks (content_digest と同じ値)
+
+        - ファイル全体をメモリに載せない
+        - ファイルオブジェクトは読み込み前の位置に戻す（続けてパースできる）
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(DIGEST_BLOCK_BYTES), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    start = source.tell()
+    for block in iter(lambda: source.read(DIGEST_BLOCK_BYTES), b""):
+        digest.update(block)
+    source.seek(start)
+    return digest.hexdigest()
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(file.stat().st_size for file in path.iterdir() if file.is_file())
+
+
+class FrameCache:
+    """content-addressed cache of prepped frames
+
+        - エントリ: `<cache_dir>/<key>/` に DataFrame ごとのファイルと meta.json
+        - 最後に使われた日時は meta.json の更新日時（読み込み時に更新する）
+        - 読み込みに失敗したエントリ（削除中など）はキャッシュミスとして扱う
+    """
+    def __init__(self, cache_dir: str = FRAME_CACHE_DIR, max_bytes: int = FRAME_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    def key(self, kind: str, digest: str, params: Optional[Dict] = None) -> str:
+        payload = json.dumps({"kind": kind, "digest": digest, "params": params or {}, "code": code_version()},
+                             sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, "pd.DataFrame"]]:
+        import pandas as pd
+
+        entry = self.cache_dir / key
+        try:
+            meta = json.loads((entry / _META_FILE).read_text(encoding="utf-8"))
+            if meta["format"] != "parquet":
+                return None
+            frames = {name: pd.read_parquet(entry / f"{name}.parquet") for name in meta["frames"]}
+            os.utime(entry / _META_FILE)
+        except (OSError, EOFError, ValueError, KeyError, ImportError):
+            return None
+        return frames
+
+    def put(self, key: str, kind: str, frames: Dict[str, "pd.DataFrame"]) -> bool:
+        """save frames as parquet and evict old entries
+
+            - return: 保存したかどうか
+                - pyarrow がない場合、parquet で元どおりに読み戻せない場合（キャッシュできない入力）は保存しない
+        """
+        if importlib.util.find_spec("pyarrow") is None or (self.cache_dir / key).exists():
+            return False
+        self.cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        os.chmod(self.cache_dir, 0o700)
+        tmp_entry = self.cache_dir / f".tmp-{key}-{uuid.uuid4().hex[:8]}"
+        tmp_entry.mkdir()
+        try:
+            cacheable = all(self.__write_frame(tmp_entry / f"{name}.parquet", frame) for name, frame in frames.items())
+            if not cacheable:
+                for file in tmp_entry.iterdir():
+                    file.unlink()
+            meta = {"kind": kind, "format": "parquet" if cacheable else _UNCACHEABLE,
+                    "frames": list(frames) if cacheable else [], "created": time.time()}
+            (tmp_entry / _META_FILE).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+            try:
+                tmp_entry.rename(self.cache_dir / key)
+            except OSError:
+                pass  # 他のプロセスが同じエントリを保存済み
+        finally:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        self.evict()
+        return cacheable
+
+    @staticmethod
+    def __write_frame(path: Path, frame: "pd.DataFrame") -> bool:
+        """write frame as parquet if it round-trips losslessly (return: 書き込んだかどうか)"""
+        import pandas as pd
+        import pyarrow as pa
+
+        try:
+            frame.to_parquet(path, engine="pyarrow")
+            pd.testing.assert_frame_equal(pd.read_parquet(path), frame, check_exact=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, AssertionError):
+            return False
+        return True
+
+    def get_or_load(self, key: str, kind: str, load: Callable[[], T], dump: Callable[[T], Dict[str, "pd.DataFrame"]],
+                    restore: Callable[[Dict[str, "pd.DataFrame"]], T]) -> T:
+        """restore(cached frames) if cached, otherwise load() and save dump(loaded)"""
+        frames = self.get(key)
+        if frames is not None:
+            return restore(frames)
+        loaded = load()
+        self.put(key, kind, dump(loaded))
+        return loaded
+
+    def entries(self) -> List[Dict]:
+        """entries (oldest used first)
+
+            - return: [{"key", "kind", "format", "bytes", "last_used"}]
+        """
+        entries = []
+        if not self.cache_dir.exists():
+            return entries
+        for entry in self.cache_dir.iterdir():
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            try:
+                meta_path = entry / _META_FILE
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                entries.append({"key": entry.name, "kind": meta["kind"], "format": meta["format"],
+                                "bytes": _dir_bytes(entry), "last_used": meta_path.stat().st_mtime})
+            except (OSError, ValueError, KeyError):
+                continue
+        return sorted(entries, key=lambda entry: entry["last_used"])
+
+    def total_bytes(self) -> int:
+        return sum(entry["bytes"] for entry in self.entries())
+
+    def evict(self, max_bytes: Optional[int] = None) -> List[str]:
+        """remove least recently used entries until the total size is within max_bytes
+
+            - return: 削除したエントリのキー
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(entry["bytes"] for entry in entries)
+        removed = []
+        for entry in entries:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(self.cache_dir / entry["key"], ignore_errors=True)
+            total -= entry["bytes"]
+            removed.append(entry["key"])
+        return removed
+
+    def clear(self) -> int:
+        """remove all entries (return: number of removed entries)"""
+        removed = self.evict(max_bytes=-1)
+        if self.cache_dir.exists():
+            # 中断された書き込みの一時ディレクトリ
+            for tmp_entry in self.cache_dir.glob(".tmp-*"):
+                shutil.rmtree(tmp_entry, ignore_errors=True)
+        return len(removed)
@@ -0,0 +1,168 @@
+"""Import Time Budget (python -X importtime)
+
+    - コマンドごとに、実際にコマンドを実行したときの import 時間を計測し、上限（budget）と比べる
+        - 別プロセスで `python -X importtime toolbox.py <command> ...` を小さな入力（fixture）で実行し、
+          stderr の出力を集計する（コマンドの本体で読み込むモジュールも含まれる）
+        - インタプリタの起動処理（site など）の import は含めない
+    - 読み込んではいけないモジュール（例: --help で pandas）が読み込まれていないかも確認する
+"""
+
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+TOOLBOX_PATH = REPO_ROOT / "toolbox.py"
+_START_MARKER = "--- importtime start ---"
+# データ処理のライブラリ（軽いコマンドでは読み込まない）
+DATA_STACK = ["pandas", "numpy", "pyarrow", "openpyxl", "pdfkit", "src.executor"]
+# 入力ファイルを必要とするコマンドの引数（{fixture}: 小さな入力のディレクトリ、{tmp}: 出力先）
+_EMULATOR_ARGS = ["-ic", "{fixture}/cms.csv", "-id6", "{fixture}/donguri_6dic.xlsx",
+                  "-id3", "{fixture}/donguri_3dic.xlsx", "-ist", "{fixture}/schooltest.csv"]
+FIXTURE_STUDENTS = 50
+
+
+@dataclass
+class ImportBudget:
+    """import time budget of a command
+
+        - args: toolbox.py の引数（コマンドを fixture で実際に実行する）
+        - budget_ms: import 時間の上限（ミリ秒）
+        - forbidden: 読み込んではいけないモジュール（サブモジュールを含む）
+        - allow_failure: コマンドが失敗してもよい（外部のプログラム・daemon がない環境。import は失敗する前に済んでいる）
+    """
+    command: str
+    args: List[str]
+    budget_ms: float
+    forbidden: List[str] = field(default_factory=list)
+    allow_failure: bool = False
+
+
+IMPORT_BUDGETS: List[ImportBudget] = [
+    ImportBudget("--help", ["--help"], 80, DATA_STACK + ["chardet"]),
+    ImportBudget("to-utf8", ["to-utf8", "-i", "{fixture}/schooltest.csv", "-o", "{tmp}/schooltest.utf8.csv"],
+                 150, DATA_STACK),
+    # daemon が起動していない場合は接続に失敗する（送信する前までの import を計測する）
+    ImportBudget("--daemon (client)", ["--daemon", "http://127.0.0.1:9", "emulator"] + _EMULATOR_ARGS,
+                 100, DATA_STACK + ["chardet"], allow_failure=True),
+    ImportBudget("cache", ["cache", "info", "--cache-dir", "{tmp}/cache"], 100, DATA_STACK + ["chardet"]),
+    # 台帳（sqlite3）・候補の提示（difflib）はオプションを指定した場合だけ読み込む
+    ImportBudget("emulator", ["emulator"] + _EMULATOR_ARGS + ["--no-cache"], 1200,
+                 ["pdfkit", "chardet", "src.ledger", "src.matching"]),
+    ImportBudget("stats", ["stats", "-i", "{fixture}/cms.csv", "--no-cache"], 1000,
+                 ["pdfkit", "chardet", "src.ledger", "src.matching"]),
+    # wkhtmltopdf がない環境では変換に失敗する
+    ImportBudget("export-list", ["export-list", "-i", "{fixture}/schooltest.csv"], 1000, ["src.executor", "chardet"],
+                 allow_failure=True),
+    ImportBudget("tmp-cnv", ["tmp-cnv", "-i", "{fixture}/accounts_2022.csv", "-o", "{tmp}/tmp-cnv"], 1200,
+                 ["pdfkit", "chardet"]),
+    ImportBudget("batch", ["batch", "-m", "{fixture}/manifest.csv", "-o", "{tmp}/batch", "-w", "1"], 1200,
+                 ["pdfkit", "chardet"]),
+]
+
+
+def write_fixture(fixture_dir: str) -> None:
+    """tiny input files of the commands (src.synth + tmp-cnv / batch の入力)"""
+    import pandas as pd
+
+    from src.account_convert import ACCOUNT_NOTE_COL, DIC_TYPE_RULES
+    from src.synth import generate_accounts, generate_inputs
+
+    paths = generate_inputs(FIXTURE_STUDENTS, fixture_dir)
+    accounts = generate_accounts(4, "u")
+    accounts[ACCOUNT_NOTE_COL] = list(DIC_TYPE_RULES.values()) * 2
+    accounts.to_csv(Path(fixture_dir) / "accounts_2022.csv", index=False, encoding="utf-8")
+    pd.DataFrame([{"name": "fixture", "dic6": paths["dic6"], "dic3": paths["dic3"],
+                   "schooltest": paths["schooltest"], "cms": paths["cms"]}]).to_csv(
+        Path(fixture_dir) / "manifest.csv", index=False, encoding="utf-8")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """parse `-X importtime` output after the start marker
+
+        - return: [(module, 階層（0: 直接 import したモジュール）, cumulative us)]
+    """
+    entries = []
+    started = False
+    for line in stderr.splitlines():
+        if line == _START_MARKER:
+            started = True
+            continue
+        if not started or not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # 見出し行
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), level, int(cumulative)))
+    return entries
+
+
+def measure_command(args: List[str], cwd: str, allow_failure: bool = False,
+                    python: str = sys.executable) -> List[Tuple[str, int, int]]:
+    """run `toolbox.py <args>` in a fresh interpreter and return the parsed importtime entries
+
+        - `python toolbox.py` と同じく、sys.path の先頭はリポジトリのルート
+        - 作業ディレクトリは cwd（コマンドの既定の出力先はここに作られる）
+    """
+    code = "; ".join([
+        "import runpy, sys",
+        f"sys.path.insert(0, {str(REPO_ROOT)!r})",
+        f"sys.argv = {[str(TOOLBOX_PATH)] + args!r}",
+        f"sys.stderr.write({_START_MARKER!r} + '\\n'); sys.stderr.flush()",
+        f"runpy.run_path({str(TOOLBOX_PATH)!r}, run_name='__main__')",
+    ])
+    completed = subprocess.run([python, "-X", "importtime", "-c", code], cwd=cwd,
+                               capture_output=True, text=True)
+    if completed.returncode != 0 and not allow_failure:
+        raise RuntimeError(f"toolbox.py {' '.join(args)} failed (exit {completed.returncode})\n{completed.stderr}")
+    return parse_importtime(completed.stderr)
+
+
+def _loaded(entries: List[Tuple[str, int, int]], module: str) -> bool:
+    return any(name == module or name.startswith(module + ".") for name, _, _ in entries)
+
+
+def check_budget(budget: ImportBudget, fixture_dir: str, runs: int = 3, scale: float = 1.0, top: int = 3) -> Dict:
+    """run a command `runs` times on the fixture and compare the fastest with its budget
+
+        - return: dict
+            - command / ms / budget_ms / heaviest (直接 import したモジュールの上位) / forbidden (読み込まれたもの) / ok
+    """
+    best: Optional[List[Tuple[str, int, int]]] = None
+    best_us = 0
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix="import-budget-") as tmp_dir:
+            args = [arg.format(fixture=fixture_dir, tmp=tmp_dir) for arg in budget.args]
+            entries = measure_command(args, tmp_dir, budget.allow_failure)
+        total_us = sum(cumulative for _, level, cumulative in entries if level == 0)
+        if best is None or total_us < best_us:
+            best, best_us = entries, total_us
+    heaviest = sorted(((name, cumulative) for name, level, cumulative in best if level == 0),
+                      key=lambda item: -item[1])[:top]
+    loaded_forbidden = [module for module in budget.forbidden if _loaded(best, module)]
+    budget_ms = budget.budget_ms * scale
+    return {
+        "command": budget.command,
+        "ms": best_us / 1000,
+        "budget_ms": budget_ms,
+        "heaviest": [{"module": name, "ms": cumulative / 1000} for name, cumulative in heaviest],
+        "forbidden": loaded_forbidden,
+        "ok": best_us / 1000 <= budget_ms and not loaded_forbidden,
+    }
+
+
+def check_budgets(commands: Optional[List[str]] = None, runs: int = 3, scale: float = 1.0) -> List[Dict]:
+    """check IMPORT_BUDGETS (commands: 対象のコマンド、None の場合はすべて)"""
+    targets = [budget for budget in IMPORT_BUDGETS if not commands or budget.command in commands]
+    unknown = set(commands or []) - {budget.command for budget in targets}
+    if unknown:
+        raise ValueError(f"unknown command: {', '.join(sorted(unknown))} "
+                         f"(available: {', '.join(budget.command for budget in IMPORT_BUDGETS)})")
+    with tempfile.TemporaryDirectory(prefix="import-budget-fixture-") as fixture_dir:
+        write_fixture(fixture_dir)
+        return [check_budget(budget, fixture_dir, runs, scale) for budget in targets]
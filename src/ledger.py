@@ -0,0 +1,82 @@
+"""Account Allocation Ledger"""
+
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, Set, Tuple
+
+
+class AccountLedger:
+    """account allocation ledger (SQLite)
+
+        - どの DONGURI アカウント（ユーザー名）を、どの生徒（テスト番号・学籍番号）に割り当てたかを記録する
+        - 再実行時は記録済みの割り当てをそのまま使い、新しい生徒にだけ未使用のアカウントを割り当てる
+        - 一度割り当てたアカウントは、生徒が一覧から消えても再利用しない（配布済みの可能性があるため）
+        - 再実行時に書き込むのは、新しい生徒と学籍番号が変わった生徒だけ
+            - 紐付け処理（結果ファイル）は全員分を毎回実行する（結果ファイルには全員分が必要なため）
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS assignments (
+                exam_id TEXT NOT NULL,
+                dic_type TEXT NOT NULL,
+                student_id TEXT,
+                user_name TEXT NOT NULL,
+                assigned_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (exam_id, dic_type),
+                UNIQUE (dic_type, user_name)
+            )
+            """)
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "AccountLedger":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def lookup(self, dic_type: str) -> Dict[str, Tuple[str, str]]:
+        """recorded assignments of dic_type
+
+            - return: dict
+                - exam_id -> (user_name, student_id)
+        """
+        rows = self._conn.execute(
+            "SELECT exam_id, user_name, student_id FROM assignments WHERE dic_type = ?", (dic_type,))
+        return {exam_id: (user_name, student_id) for exam_id, user_name, student_id in rows}
+
+    def assigned_exam_ids(self) -> Dict[str, Set[str]]:
+        """dic types recorded per exam_id (all dic types)"""
+        result: Dict[str, Set[str]] = {}
+        for exam_id, dic_type in self._conn.execute("SELECT exam_id, dic_type FROM assignments"):
+            result.setdefault(exam_id, set()).add(dic_type)
+        return result
+
+    def used_user_names(self, dic_type: str) -> Set[str]:
+        rows = self._conn.execute("SELECT user_name FROM assignments WHERE dic_type = ?", (dic_type,))
+        return {user_name for (user_name,) in rows}
+
+    def record(self, dic_type: str, assignments: Iterable[Tuple[str, str, str]]) -> None:
+        """record assignments
+
+            - assignments: (exam_id, student_id, user_name)
+                - 既存の割り当ては学籍番号だけ更新する（アカウントは変えない）
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO assignments (exam_id, dic_type, student_id, user_name, assigned_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (exam_id, dic_type) DO UPDATE SET
+                    student_id = excluded.student_id,
+                    updated_at = excluded.updated_at
+                """,
+                [(exam_id, dic_type, student_id, user_name, now, now)
+                 for exam_id, student_id, user_name in assignments])
@@ -0,0 +1,135 @@
+"""Candidate Matching (for manual operation)
+
+    テスト番号 ↔ 学籍番号 で紐付けできなかった生徒（学校提供データ側）と、
+    紐付けされなかった新入生のCMSデータを、名前・カナ・IDの近さで候補として対応づける
+
+    - 全ペアを比較せず、ブロッキングインデックスで候補を絞り込んでから採点する
+        - 名前・カナ: 文字 bigram の転置インデックス
+        - ID: 1文字削除した文字列の転置インデックス（編集距離1以内の入力ミスを拾う）
+"""
+
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Set
+
+import pandas as pd
+
+
+MATCH_TOP_K = 3             # 1人あたりの候補数
+MATCH_MIN_SCORE = 0.5       # これ未満の候補は出力しない
+MATCH_MAX_POSTINGS = 500    # これより多くの行に出現する bigram は絞り込みに使わない（ありふれた文字）
+MATCH_WEIGHT_NAME = 0.4
+MATCH_WEIGHT_KANA = 0.4
+MATCH_WEIGHT_ID = 0.2
+
+_HIRAGANA_TO_KATAKANA = {code: code + 0x60 for code in range(ord("ぁ"), ord("ゖ") + 1)}
+
+
+def normalize_name(value) -> str:
+    """NFKC + remove spaces"""
+    if not isinstance(value, str):
+        return ""
+    return "".join(unicodedata.normalize("NFKC", value).split())
+
+
+def normalize_kana(value) -> str:
+    """NFKC + hiragana -> katakana + remove spaces"""
+    return normalize_name(value).translate(_HIRAGANA_TO_KATAKANA)
+
+
+def bigrams(text: str) -> Set[str]:
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def id_deletes(value: str) -> Set[str]:
+    """value itself and all strings with one character deleted"""
+    if not value:
+        return set()
+    return {value} | {value[:i] + value[i + 1:] for i in range(len(value))}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Damerau-Levenshtein (optimal string alignment) distance"""
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[len(b)]
+
+
+def similarity(a: str, b: str) -> float:
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+class BlockingIndex:
+    """inverted index: key -> row positions"""
+    def __init__(self, keys_per_row: Iterable[Set[str]], max_postings: int = MATCH_MAX_POSTINGS):
+        self._postings: Dict[str, List[int]] = {}
+        for pos, keys in enumerate(keys_per_row):
+            for key in keys:
+                self._postings.setdefault(key, []).append(pos)
+        self._max_postings = max_postings
+
+    def candidates(self, keys: Set[str]) -> Set[int]:
+        result: Set[int] = set()
+        for key in keys:
+            postings = self._postings.get(key)
+            if postings is not None and len(postings) <= self._max_postings:
+                result.update(postings)
+        return result
+
+
+def suggest_candidates(left: pd.DataFrame, right: pd.DataFrame,
+                       left_id: str, left_name: str, left_kana: str,
+                       right_id: str, right_name: str, right_kana: str,
+                       top_k: int = MATCH_TOP_K, min_score: float = MATCH_MIN_SCORE) -> pd.DataFrame:
+    """ranked candidates in right for each row of left
+
+        - score = 名前類似度 * 0.4 + カナ類似度 * 0.4 + (IDの編集距離が1以内なら) 0.2
+        - return: columns = left_pos, right_pos, rank, score, name_similarity, kana_similarity, id_distance
+            - left_pos / right_pos は left / right の行位置
+    """
+    left_names = [normalize_name(v) for v in left[left_name]]
+    left_kanas = [normalize_kana(v) for v in left[left_kana]]
+    left_ids = [normalize_name(v) for v in left[left_id].astype("string").fillna("")]
+    right_names = [normalize_name(v) for v in right[right_name]]
+    right_kanas = [normalize_kana(v) for v in right[right_kana]]
+    right_ids = [normalize_name(v) for v in right[right_id].astype("string").fillna("")]
+
+    name_index = BlockingIndex(bigrams(name) | {"kana:" + k for k in bigrams(kana)}
+                               for name, kana in zip(right_names, right_kanas))
+    id_index = BlockingIndex((id_deletes(right_id_) for right_id_ in right_ids), max_postings=len(right_ids) + 1)
+
+    rows = []
+    for left_pos, (name, kana, id_) in enumerate(zip(left_names, left_kanas, left_ids)):
+        candidates = name_index.candidates(bigrams(name) | {"kana:" + k for k in bigrams(kana)})
+        candidates |= id_index.candidates(id_deletes(id_))
+
+        scored = []
+        for right_pos in candidates:
+            name_sim = similarity(name, right_names[right_pos])
+            kana_sim = similarity(kana, right_kanas[right_pos])
+            id_dist = edit_distance(id_, right_ids[right_pos]) if id_ and right_ids[right_pos] else None
+            score = (MATCH_WEIGHT_NAME * name_sim + MATCH_WEIGHT_KANA * kana_sim
+                     + (MATCH_WEIGHT_ID if id_dist is not None and id_dist <= 1 else 0.0))
+            if score >= min_score:
+                scored.append((score, right_pos, name_sim, kana_sim, id_dist))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        for rank, (score, right_pos, name_sim, kana_sim, id_dist) in enumerate(scored[:top_k], start=1):
+            rows.append({
+                "left_pos": left_pos, "right_pos": right_pos, "rank": rank, "score": round(score, 3),
+                "name_similarity": round(name_sim, 3), "kana_similarity": round(kana_sim, 3),
+                "id_distance": id_dist,
+            })
+    return pd.DataFrame(rows, columns=["left_pos", "right_pos", "rank", "score",
+                                       "name_similarity", "kana_similarity", "id_distance"])
@@ -0,0 +1,106 @@
+"""PDF Export of the matching list (per course / class)"""
+
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from string import Template
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pdfkit
+
+from src.executor import JiyuStuCols
+
+
+FN_MERGED_PDF = "list_all.pdf"
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+<style>
+body { font-family: sans-serif; font-size: 10pt; }
+table { border-collapse: collapse; }
+th, td { border: 1px solid #999; padding: 2px 6px; }
+</style>
+</head>
+<body>
+<h2>$title</h2>
+$table
+</body>
+</html>
+"""
+# wkhtmltopdf に渡すオプション（UTF-8 の HTML として読ませる）
+PDFKIT_OPTIONS = {"encoding": "UTF-8", "quiet": ""}
+
+
+@lru_cache(maxsize=None)
+def html_template() -> Template:
+    return Template(HTML_TEMPLATE)
+
+
+def render_html(title: str, data: pd.DataFrame) -> str:
+    """html of one group (title + table)"""
+    return html_template().substitute(title=title, table=data.to_html(index=False, na_rep=""))
+
+
+def _key_names(keys: tuple) -> List[str]:
+    return ["" if pd.isna(key) else str(key) for key in keys]
+
+
+def group_title(keys: tuple) -> str:
+    """title of a group, e.g. 特進 A"""
+    return " ".join(_key_names(keys))
+
+
+def group_file_stem(keys: tuple) -> str:
+    """file name (without suffix) of a group, e.g. list_特進_A"""
+    return "_".join(["list"] + [re.sub(r'[\\/:*?"<>|\s]+', "-", name) for name in _key_names(keys)])
+
+
+def split_by_class(data: pd.DataFrame, cols: JiyuStuCols = JiyuStuCols()) -> Dict[tuple, pd.DataFrame]:
+    """split the matching list by コース / クラス
+
+        - return: (コース, クラス) -> rows of the group (コース・クラス順)
+    """
+    keys = [col for col in [cols.course_name, cols.class_name] if col in data.columns]
+    if not keys:
+        raise ValueError(f"columns not found: {cols.course_name} / {cols.class_name}")
+    return {group if isinstance(group, tuple) else (group,): rows
+            for group, rows in data.groupby(keys, sort=True, dropna=False)}
+
+
+def export_by_class(data: pd.DataFrame, out_dir: str, max_workers: Optional[int] = None,
+                    merged: bool = False) -> List[Path]:
+    """export one pdf per コース / クラス, converted concurrently
+
+        - HTML は一時ディレクトリに書き出し、wkhtmltopdf（pdfkit）でグループごとに並行して変換する
+        - merged: 全グループを1つにまとめた PDF（`list_all.pdf`）も出力する
+        - return: 出力した PDF のパス
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    groups = split_by_class(data)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        html_paths = []
+        for keys, rows in groups.items():
+            html_path = Path(tmp_dir) / f"{group_file_stem(keys)}.html"
+            html_path.write_text(render_html(group_title(keys), rows), encoding="utf-8")
+            html_paths.append(html_path)
+
+        # wkhtmltopdf は別プロセスで動くため、スレッドで並行に呼び出す
+        pdf_paths = [out / f"{html_path.stem}.pdf" for html_path in html_paths]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(pdfkit.from_file, str(html_path), str(pdf_path), options=PDFKIT_OPTIONS)
+                       for html_path, pdf_path in zip(html_paths, pdf_paths)]
+            for future in futures:
+                future.result()
+
+        if merged:
+            merged_path = out / FN_MERGED_PDF
+            pdfkit.from_file([str(html_path) for html_path in html_paths], str(merged_path), options=PDFKIT_OPTIONS)
+            pdf_paths.append(merged_path)
+    return pdf_paths
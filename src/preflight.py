@@ -0,0 +1,166 @@
+"""Pre-flight Validation of the input files
+
+    - 紐付け処理（ShiraishiExecutor.main_func）を実行する前に、読み込み済みの4つの入力から
+      実行後に分かる問題（アカウント不足・学籍番号の重複や空・CMSに見つからないテスト番号）をまとめて検出する
+    - 各入力を1回ずつ走査するだけ（ベクトル演算）で、紐付け処理は実行しない
+    - level
+        - error: このまま実行すると結果が不完全になる（例: アカウント不足）
+        - warning: 実行はできるが、手動での確認・作業が必要になる
+        - info: 前処理で対応済み（参考）
+"""
+
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from src.executor import CmsData, DonguriAccount, JiyuStudents
+from src.executor import PROD_NAME_DIC3, PROD_NAME_DIC6, VIRTUAL_ID_PREFIX, buying_dic_type
+
+
+ERROR = "error"
+WARNING = "warning"
+INFO = "info"
+
+
+@dataclass
+class PreflightIssue:
+    """one finding (rows: 該当する行。一覧を表示するため)"""
+    level: str
+    code: str
+    message: str
+    rows: Optional[pd.DataFrame] = None
+
+
+@dataclass
+class PreflightReport:
+    """result of preflight()
+
+        - demand: 副教材タイプごとの想定される必要アカウント数と、用意されたアカウント数
+            - columns: 副教材タイプ / 必要アカウント数 / アカウント数 / 不足数
+        - issues: 検出した問題（error -> warning -> info の順）
+        - seconds: 検証にかかった時間（読み込みは含まない）
+    """
+    demand: pd.DataFrame
+    issues: List[PreflightIssue] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        """no error (warning / info だけの場合は実行してよい)"""
+        return not any(issue.level == ERROR for issue in self.issues)
+
+    def to_dict(self, max_rows: int = 20) -> Dict:
+        return {
+            "ok": self.ok,
+            "seconds": self.seconds,
+            "demand": self.demand.to_dict(orient="records"),
+            "issues": [{"level": issue.level, "code": issue.code, "message": issue.message,
+                        "rows": [] if issue.rows is None else json.loads(
+                            issue.rows.head(max_rows).to_json(orient="records", force_ascii=False))}
+                       for issue in self.issues],
+        }
+
+    def format_text(self, max_rows: int = 5) -> str:
+        lines = [self.demand.to_string(index=False), ""]
+        for issue in self.issues:
+            lines.append(f"[{issue.level.upper()}] {issue.message}")
+            if issue.rows is not None and not issue.rows.empty:
+                lines.extend("    " + line for line in issue.rows.head(max_rows).to_string(index=False).splitlines())
+                if issue.rows.shape[0] > max_rows:
+                    lines.append(f"    ... ({issue.rows.shape[0]} rows)")
+        lines.append(f"pre-flight: {'OK' if self.ok else 'NG'} ({self.seconds * 1000:.1f} ms)")
+        return "\n".join(lines)
+
+
+_LEVEL_ORDER = {ERROR: 0, WARNING: 1, INFO: 2}
+DEMAND_COLS = ["副教材タイプ", "必要アカウント数", "アカウント数", "不足数"]
+
+
+def preflight(cms_data: CmsData, dongri_data_6dic: DonguriAccount, dongri_data_3dic: DonguriAccount,
+              jiyu_students: JiyuStudents) -> PreflightReport:
+    """validate the loaded (prepped) inputs
+
+        - 入力は読み込み直後（CmsData.load_prep 済み、main_func の実行前）のもの
+        - 必要アカウント数は main_func と同じ判定（新入生・学籍番号ごとに 6辞書 > 3辞書 > 購入しない、
+          テスト番号 = 学籍番号 で結合）で求める（台帳を使う場合の既存の割り当ては考慮しない）
+    """
+    start = time.perf_counter()
+    cms_cols, jyg_cols = cms_data.cols, jiyu_students.cols
+    cms, jyg = cms_data.data, jiyu_students.data
+    issues: List[PreflightIssue] = []
+
+    # --------------------------------------------------
+    # CMS: 新入生の学籍番号ごとの辞書の購入（1回の集計）
+    # --------------------------------------------------
+    _student_id = cms[cms_cols.student_id]
+    _is_newbie = (cms[cms_cols.cur_school_year] == 0).fillna(False).to_numpy() & _student_id.notna().to_numpy()
+    _prod_name = cms[cms_cols.prod_name]
+    _bought = pd.DataFrame({
+        'dic6': (_prod_name == PROD_NAME_DIC6).fillna(False).to_numpy()[_is_newbie],
+        'dic3': (_prod_name == PROD_NAME_DIC3).fillna(False).to_numpy()[_is_newbie],
+    }).groupby(_student_id.to_numpy()[_is_newbie], sort=False).any()
+
+    # --------------------------------------------------
+    # 学校のテスト番号 -> CMS の学籍番号
+    # --------------------------------------------------
+    _exam_id = jyg[jyg_cols.exam_id]
+    _matched = _exam_id.isin(_bought.index).to_numpy() & _exam_id.notna().to_numpy()
+    _is_dic6 = _matched & _exam_id.map(_bought['dic6']).eq(True).to_numpy()
+    _is_dic3 = _matched & ~_is_dic6 & _exam_id.map(_bought['dic3']).eq(True).to_numpy()
+
+    _demand = [(buying_dic_type.DIC_6, int(_is_dic6.sum()), dongri_data_6dic.data.shape[0]),
+               (buying_dic_type.DIC_3, int(_is_dic3.sum()), dongri_data_3dic.data.shape[0])]
+    demand = pd.DataFrame([(dic_type, need, accounts, max(need - accounts, 0)) for dic_type, need, accounts in _demand],
+                          columns=DEMAND_COLS)
+    for dic_type, need, accounts in _demand:
+        if need > accounts:
+            issues.append(PreflightIssue(
+                ERROR, f"account_shortage_{dic_type}",
+                f"{dic_type}のアカウントが不足しています: 必要 {need} / アカウント {accounts}（{need - accounts} 件不足）"))
+
+    _target_cols = [jyg_cols.exam_id, jyg_cols.course_name, jyg_cols.class_name, jyg_cols.student_name]
+    _missing = jyg.loc[~_matched, _target_cols].reset_index(drop=True)
+    if not _missing.empty:
+        issues.append(PreflightIssue(
+            WARNING, "exam_id_not_in_cms",
+            f"CMSデータ（新入生）に見つからないテスト番号: {_missing.shape[0]} 件（手動オペレーションの対象になります）",
+            _missing))
+    _dup_exam = jyg.loc[_exam_id.notna().to_numpy() & _exam_id.duplicated(keep=False).to_numpy(), _target_cols]
+    if not _dup_exam.empty:
+        issues.append(PreflightIssue(
+            WARNING, "duplicated_exam_id",
+            f"学校のデータで重複しているテスト番号: {_dup_exam[jyg_cols.exam_id].nunique()} 件", _dup_exam.reset_index(drop=True)))
+
+    # --------------------------------------------------
+    # 学籍番号の重複・空（CmsData.load_prep の Hotfix でカバーできないケース）
+    # --------------------------------------------------
+    _id_issues = cms_data.id_issues
+    if not _id_issues.duplicated_student_ids.empty:
+        issues.append(PreflightIssue(
+            WARNING, "duplicated_student_id",
+            f"異なるメールアドレス間で重複している学籍番号: "
+            f"{_id_issues.duplicated_student_ids[cms_cols.student_id].nunique()} 件",
+            _id_issues.duplicated_student_ids))
+    if not _id_issues.shared_empty_id_emails.empty:
+        issues.append(PreflightIssue(
+            WARNING, "shared_empty_id_email",
+            f"学籍番号が空で、複数の生徒名が使っているメールアドレス: "
+            f"{_id_issues.shared_empty_id_emails[cms_cols.email].nunique()} 件",
+            _id_issues.shared_empty_id_emails))
+    _no_id = _student_id.isna().to_numpy()
+    if _no_id.any():
+        issues.append(PreflightIssue(
+            WARNING, "empty_student_id",
+            f"学籍番号・メールアドレスがともに空の行: {int(_no_id.sum())} 件（紐付けできません）",
+            cms.loc[_no_id, [cms_cols.id, cms_cols.student_name, cms_cols.prod_name]].reset_index(drop=True)))
+    _virtual_id = _student_id.str.startswith(VIRTUAL_ID_PREFIX).fillna(False).to_numpy()
+    if _virtual_id.any():
+        issues.append(PreflightIssue(
+            INFO, "virtual_student_id",
+            f"学籍番号が空の行: {int(_virtual_id.sum())} 件（メールアドレスごとに仮IDを割り振り済み）"))
+
+    issues.sort(key=lambda issue: _LEVEL_ORDER[issue.level])
+    return PreflightReport(demand=demand, issues=issues, seconds=time.perf_counter() - start)
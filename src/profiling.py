@@ -0,0 +1,74 @@
+"""Stage Profiling"""
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mib() -> Optional[float]:
+    """peak resident set size of this process (MiB), None if unavailable
+
+        - プロセス開始からの最大値（ステージごとの値は「そのステージ終了時点までの最大値」）
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KiB, macOS: bytes
+    return max_rss / 2 ** 20 if sys.platform == "darwin" else max_rss / 2 ** 10
+
+
+@dataclass
+class StageRecord:
+    name: str
+    seconds: float = 0.0
+    peak_rss_mib: Optional[float] = None
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None
+
+
+class StageProfiler:
+    """records wall time, peak RSS and row counts of each stage"""
+    def __init__(self):
+        self.records: List[StageRecord] = []
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None) -> Iterator[StageRecord]:
+        """measure a stage
+
+            - 呼び出し側で `record.rows_out` を設定する
+        """
+        record = StageRecord(name=name, rows_in=rows_in)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - start
+            record.peak_rss_mib = peak_rss_mib()
+            self.records.append(record)
+
+    def report(self) -> Dict:
+        return {
+            "stages": [asdict(record) for record in self.records],
+            "total_seconds": sum(record.seconds for record in self.records),
+            "peak_rss_mib": peak_rss_mib(),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.report(), ensure_ascii=False, indent=2)
+
+    def format_table(self) -> str:
+        lines = [f"{'stage':<32} {'seconds':>9} {'peak_rss_mib':>13} {'rows_in':>10} {'rows_out':>10}"]
+        for record in self.records:
+            peak = f"{record.peak_rss_mib:.1f}" if record.peak_rss_mib is not None else "-"
+            rows_in = record.rows_in if record.rows_in is not None else "-"
+            rows_out = record.rows_out if record.rows_out is not None else "-"
+            lines.append(f"{record.name:<32} {record.seconds:>9.3f} {peak:>13} {rows_in:>10} {rows_out:>10}")
+        return "\n".join(lines)
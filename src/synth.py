@@ -0,0 +1,152 @@
+"""Synthetic Input Generator
+
+    実データ（生徒情報）を使わずに処理を計測・検証するための入力データを生成する
+
+    - CMSデータ (CSV/UTF-8, ヘッダーなし, CmsDataCols の列順)
+        - 新入生以外の学年の生徒、学籍番号が空の生徒（メールアドレス共有を含む）、重複注文を含む
+    - DONGURIアカウント一覧 6辞書 / 3辞書 (xlsx)
+    - 学校提供の生徒情報 (CSV/UTF-8, JiyuStuCols の列)
+        - CMSに存在しない（テスト番号の入力ミスなど）生徒を含む
+"""
+
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from src.executor import CmsDataCols, DonguriAccCols, JiyuStuCols, PROD_NAME_DIC3, PROD_NAME_DIC6
+from src.executor import write_workbook_fast
+
+
+FN_SYNTH_CMS = "cms.csv"
+FN_SYNTH_DIC6 = "donguri_6dic.xlsx"
+FN_SYNTH_DIC3 = "donguri_3dic.xlsx"
+FN_SYNTH_SCHOOLTEST = "schooltest.csv"
+
+PROD_NAME_COURSES = ["特進S1年", "特進1年", "進学1年", "総合1年"]
+PROD_NAME_OTHERS = ["電子辞書ケース", "ワークブック"]
+
+
+@dataclass
+class SynthConfig:
+    """ratios of the generated data"""
+    newbie_ratio: float = 0.4           # 新入生（現在の学年 == 0）の割合
+    dic6_ratio: float = 0.45            # 6辞書を購入する生徒の割合
+    dic3_ratio: float = 0.35            # 3辞書を購入する生徒の割合（残りは購入しない）
+    empty_id_ratio: float = 0.02        # 学籍番号が空の生徒の割合
+    shared_email_ratio: float = 0.2     # 学籍番号が空の生徒のうち、メールアドレスを共有する割合
+    duplicate_order_ratio: float = 0.03 # 重複して登録される注文の割合
+    unmatched_ratio: float = 0.03       # 学校提供データのテスト番号がCMSと一致しない生徒の割合
+    account_margin: float = 1.02        # 準備するアカウント数（購入者数に対する比）
+
+
+def _names(prefix: str, ids: np.ndarray) -> np.ndarray:
+    return np.char.add(prefix, ids.astype(str))
+
+
+def generate_cms(n_students: int, seed: int = 0, config: SynthConfig = SynthConfig()) -> pd.DataFrame:
+    """CMS orders of n_students (all grades)"""
+    rng = np.random.default_rng(seed)
+    cols = CmsDataCols()
+    sids = np.arange(n_students)
+
+    student_id = np.char.add("S", np.char.zfill(sids.astype(str), 7)).astype(object)
+    email = np.char.add(np.char.add("student", sids.astype(str)), "@example.com").astype(object)
+    empty_id = rng.random(n_students) < config.empty_id_ratio
+    student_id[empty_id] = None
+    shared = empty_id & (rng.random(n_students) < config.shared_email_ratio)
+    email[shared] = "family@example.com"
+
+    grade = np.where(rng.random(n_students) < config.newbie_ratio, 0, rng.integers(1, 3, n_students))
+    dic = rng.random(n_students)
+    dic_prod = np.where(dic < config.dic6_ratio, PROD_NAME_DIC6,
+                        np.where(dic < config.dic6_ratio + config.dic3_ratio, PROD_NAME_DIC3, ""))
+
+    students = pd.DataFrame({
+        cols.student_id: student_id,
+        cols.student_name: np.char.add(np.char.add(_names("生徒　", sids), "("), np.char.add(_names("セイト", sids), ")")),
+        cols.student_name_kana: _names("セイト", sids),
+        cols.email: email,
+        cols.registered: "2022-04-01 10:00:00",
+        cols.school_id: 1,
+        cols.cur_school_year: grade,
+    })
+
+    # 注文: コース（全員） + 辞書（購入者のみ） + その他（一部）
+    course = students.assign(**{cols.prod_name: rng.choice(PROD_NAME_COURSES, n_students)})
+    dic_orders = students[dic_prod != ""].assign(**{cols.prod_name: dic_prod[dic_prod != ""]})
+    has_other = rng.random(n_students) < 0.3
+    others = students[has_other].assign(**{cols.prod_name: rng.choice(PROD_NAME_OTHERS, int(has_other.sum()))})
+    orders = pd.concat([course, dic_orders, others])
+    duplicated = orders[rng.random(orders.shape[0]) < config.duplicate_order_ratio]
+    orders = pd.concat([orders, duplicated]).sample(frac=1.0, random_state=seed)
+
+    orders.insert(0, cols.id, np.arange(1, orders.shape[0] + 1))
+    return orders[list(asdict(cols).values())].reset_index(drop=True)
+
+
+def generate_schooltest(cms: pd.DataFrame, seed: int = 0, config: SynthConfig = SynthConfig()) -> pd.DataFrame:
+    """school test students (= newbies of cms, with unmatched test ids)"""
+    rng = np.random.default_rng(seed + 1)
+    cms_cols = CmsDataCols()
+    cols = JiyuStuCols()
+    newbies = cms[(cms[cms_cols.cur_school_year] == 0) & cms[cms_cols.student_id].notna()]
+    newbies = newbies.drop_duplicates(subset=[cms_cols.student_id])
+    n = newbies.shape[0]
+
+    exam_id = newbies[cms_cols.student_id].to_numpy(dtype=object).copy()
+    unmatched = rng.random(n) < config.unmatched_ratio
+    exam_id[unmatched] = np.char.add("X", exam_id[unmatched].astype(str))
+    return pd.DataFrame({
+        cols.exam_id: exam_id,
+        cols.course_name: rng.choice(["特進", "進学", "総合"], n),
+        cols.class_name: rng.choice(list("ABCDEF"), n),
+        cols.student_name: newbies[cms_cols.student_name].str.split("(").str[0].to_numpy(),
+        cols.student_name_kana: newbies[cms_cols.student_name_kana].to_numpy(),
+        cols.sex_type: rng.choice(["男", "女"], n),
+    })
+
+
+def generate_accounts(n_accounts: int, prefix: str) -> pd.DataFrame:
+    cols = DonguriAccCols()
+    ids = np.arange(n_accounts).astype(str)
+    return pd.DataFrame({
+        cols.user_name: np.char.add(prefix, np.char.zfill(ids, 7)),
+        cols.group_name: "自由ケ丘高校",
+        cols.temp_password: np.char.add("pw", np.char.zfill(ids, 8)),
+    })
+
+
+def input_paths(out_dir: str) -> Dict[str, Path]:
+    """paths of the 4 input files in out_dir"""
+    out = Path(out_dir)
+    return {
+        "cms": out / FN_SYNTH_CMS,
+        "dic6": out / FN_SYNTH_DIC6,
+        "dic3": out / FN_SYNTH_DIC3,
+        "schooltest": out / FN_SYNTH_SCHOOLTEST,
+    }
+
+
+def generate_inputs(n_students: int, out_dir: str, seed: int = 0, config: SynthConfig = SynthConfig()) -> Dict[str, Path]:
+    """write all 4 input files into out_dir
+
+        - return: {"cms": path, "dic6": path, "dic3": path, "schooltest": path}
+    """
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    cms = generate_cms(n_students, seed, config)
+    schooltest = generate_schooltest(cms, seed, config)
+
+    cms_cols = CmsDataCols()
+    newbie_orders = cms[cms[cms_cols.cur_school_year] == 0][cms_cols.prod_name]
+    n_dic6 = int((newbie_orders == PROD_NAME_DIC6).sum() * config.account_margin)
+    n_dic3 = int((newbie_orders == PROD_NAME_DIC3).sum() * config.account_margin)
+
+    paths = input_paths(out_dir)
+    cms.to_csv(paths["cms"], header=False, index=False, encoding="utf-8")
+    write_workbook_fast(paths["dic6"], {"Sheet1": generate_accounts(n_dic6, "d6u")})
+    write_workbook_fast(paths["dic3"], {"Sheet1": generate_accounts(n_dic3, "d3u")})
+    schooltest.to_csv(paths["schooltest"], index=False, encoding="utf-8")
+    return paths
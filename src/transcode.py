@@ -0,0 +1,115 @@
+"""Streaming Encoding Conversion (to UTF-8)
+
+    - 文字コードの判定は先頭の一部（サンプル）だけで行い、判定が確定した時点で読み込みをやめる
+    - 変換は1行ずつ読み書きする（pandas を通さないため、値が変わらない）
+"""
+
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from chardet import UniversalDetector
+
+
+DETECT_BLOCK_BYTES = 64 * 1024
+DETECT_SAMPLE_BYTES = 1024 * 1024   # 判定に使う最大のバイト数（先頭の ASCII だけのブロックは含まない）
+UTF8_ENCODINGS = {"utf-8", "ascii"}
+# chardet の判定結果 -> 変換に使うエンコーディング
+# - Windows で作成された Shift-JIS のファイルは機種依存文字（①、㈱ など）を含むため cp932 で読む
+ENCODING_ALIASES = {"shift_jis": "cp932"}
+UTF8_SUFFIX = ".utf8.csv"
+
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+_ESC = b"\x1b"
+
+
+def detect_encoding(path: str, sample_bytes: int = DETECT_SAMPLE_BYTES) -> Tuple[Optional[str], float]:
+    """detect the encoding of path from a bounded sample
+
+        - return: (encoding, confidence)
+            - encoding は chardet の判定結果（小文字）。判定できない場合は None
+        - ASCII だけの行は判定の手がかりにならないため読み飛ばし、
+          最初に非ASCIIの文字が現れた行から sample_bytes までで判定する
+            - ただし ESC（0x1b）を含むブロックが現れた場合は、ファイルの先頭から sample_bytes までで判定する
+              （ISO-2022-JP などは 7bit のバイトだけで書かれ、エスケープシーケンスで判定される）
+        - 最後まで ASCII だけ（ESC もない）の場合は 'ascii'
+    """
+    detector = UniversalDetector()
+    sampled_bytes = 0
+    with open(path, "rb") as f:
+        while not detector.done and sampled_bytes < sample_bytes:
+            block = f.read(DETECT_BLOCK_BYTES)
+            if not block:
+                break
+            if sampled_bytes == 0:
+                if _ESC in block:
+                    f.seek(0)
+                    block = f.read(DETECT_BLOCK_BYTES)
+                elif block.isascii():
+                    continue
+                else:
+                    # 最初に非ASCIIの文字が現れた行から判定する
+                    block = block[block.rfind(b"\n", 0, _NON_ASCII.search(block).start()) + 1:]
+            detector.feed(block)
+            sampled_bytes += len(block)
+    if sampled_bytes == 0:
+        return "ascii", 1.0
+    result = detector.close()
+    encoding = result["encoding"].lower() if result["encoding"] else None
+    return encoding, result["confidence"]
+
+
+def utf8_output_path(input_path: str, out_dir: Optional[str] = None) -> str:
+    """default output path (input.utf8.csv)"""
+    output = input_path + UTF8_SUFFIX
+    if out_dir is None:
+        return output
+    return str(Path(out_dir) / Path(output).name)
+
+
+def transcode(input_path: str, output_path: str, encoding: str) -> None:
+    """copy input_path to output_path as UTF-8, line by line (line endings are kept)"""
+    with open(input_path, "r", encoding=ENCODING_ALIASES.get(encoding, encoding), newline="") as fin, \
+            open(output_path, "w", encoding="utf-8", newline="") as fout:
+        fout.writelines(fin)
+
+
+def convert_file(input_path: str, output_path: Optional[str] = None) -> Dict:
+    """detect and convert one file
+
+        - return: dict
+            - input / output / encoding / confidence / status ('converted' | 'skipped' | 'failed') / error
+    """
+    output_path = output_path if output_path is not None else utf8_output_path(input_path)
+    result = {"input": input_path, "output": output_path, "encoding": None, "confidence": 0.0,
+              "status": "converted", "error": ""}
+    try:
+        encoding, confidence = detect_encoding(input_path)
+        result.update(encoding=encoding, confidence=confidence)
+        if encoding is None or encoding in UTF8_ENCODINGS:
+            result.update(output=None, status="skipped")
+            return result
+        transcode(input_path, output_path, encoding)
+    except (OSError, UnicodeDecodeError, LookupError) as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    return result
+
+
+def find_inputs(input_dir: str, pattern: str) -> List[str]:
+    """files in input_dir matching pattern (converted outputs are excluded)"""
+    return sorted(str(path) for path in Path(input_dir).glob(pattern)
+                  if path.is_file() and not path.name.endswith(UTF8_SUFFIX))
+
+
+def convert_files(input_paths: List[str], out_dir: Optional[str] = None,
+                  max_workers: Optional[int] = None) -> List[Dict]:
+    """convert many files in a process pool
+
+        - out_dir: 出力先（None の場合は入力ファイルと同じディレクトリ）
+    """
+    if out_dir is not None:
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+    output_paths = [utf8_output_path(path, out_dir) for path in input_paths]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(convert_file, input_paths, output_paths))
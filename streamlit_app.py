@@ -1,20 +1,133 @@
 """streamlit app"""
 
-from pathlib import Path
+import hashlib
+import io
 import time
 
 import pandas as pd
 import streamlit as st
 
-from src.executor import ShiraishiExecutor
-from src.executor import OUT_DIR, FP_RESULT, FN_RESULT, FP_FAILED_STUDENTS, FN_FAILED_STUDENTS, FP_REST_DONGURI_ACC, FN_REST_DONGURI_ACC
+from src.background import BackgroundJob
+from src.executor import CmsData, DonguriAccount, JiyuStudents
+from src.executor import ExecutorOptions, ShiraishiExecutor, load_cached
+from src.frame_cache import FRAME_CACHE_DIR, FrameCache
+from src.preflight import ERROR, INFO, WARNING, PreflightReport
+
+
+# 1ファイル種別あたりに保持するパース済みデータ数（超えたら古いものから破棄）
+PARSE_CACHE_MAX_ENTRIES = 4
+# 実行中のジョブの進捗を更新する間隔（秒）
+PROGRESS_REFRESH_SECONDS = 1.0
 
 
 # FUNCTIONS
+def file_digest(uploaded_file) -> str:
+    return hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+
+
+@st.cache_resource
+def frame_cache() -> FrameCache:
+    """disk cache of prepped input data (shared with toolbox.py)"""
+    return FrameCache(FRAME_CACHE_DIR)
+
+
+# - アップロードファイルの内容ハッシュをキーにパース・前処理済みデータをキャッシュする
+#   - メモリ上（セッション間で共有）と、ディスク上（src.frame_cache。再起動後・CLI と共有）の2段
+# - `_` 始まりの引数はキャッシュキーに含まれない（ハッシュ計算を二重に行わない）
+@st.cache_resource(max_entries=PARSE_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_cms_data(digest: str, _uploaded_file) -> CmsData:
+    return load_cached(frame_cache(), 'cms', io.BytesIO(_uploaded_file.getvalue()), {'newbie_only': False},
+                       CmsData, CmsData.to_frames, CmsData.from_frames, digest=digest)
+
+
+@st.cache_resource(max_entries=PARSE_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_donguri_account(digest: str, _uploaded_file) -> DonguriAccount:
+    # 形式（xlsx / csv / parquet）はファイル名で判定するため、名前を付けたバッファを渡す
+    _buffer = io.BytesIO(_uploaded_file.getvalue())
+    _buffer.name = _uploaded_file.name
+    return load_cached(frame_cache(), 'donguri', _buffer, {'fast_load': False},
+                       DonguriAccount, DonguriAccount.to_frames, DonguriAccount.from_frames, digest=digest)
+
+
+@st.cache_resource(max_entries=PARSE_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_jiyu_students(digest: str, _uploaded_file) -> JiyuStudents:
+    return load_cached(frame_cache(), 'jiyu_students', io.BytesIO(_uploaded_file.getvalue()), {},
+                       JiyuStudents, JiyuStudents.to_frames, JiyuStudents.from_frames, digest=digest)
+
+
+def job_key(digests, options: ExecutorOptions) -> str:
+    """key of a job: same input files and options -> same key"""
+    return hashlib.sha256(repr((tuple(digests), options)).encode()).hexdigest()
+
+
+def execute(key: str, executor: ShiraishiExecutor):
+    """start the job in a background thread (1 job per session)
+
+        - 実行中のジョブがある場合、同じ入力の結果を保持している場合は実行しない
+    """
+    job = st.session_state.get('job')
+    if job is not None and job.active:
+        st.session_state['job_message'] = 'already running'
+        return
+    if job is not None and job.key == key and st.session_state.get('export_buffers'):
+        st.session_state['job_message'] = 'already executed with the same inputs (Clear Result to run again)'
+        return
+    st.session_state.pop('job_message', None)
+    st.session_state.pop('export_buffers', None)
+    job = BackgroundJob(key, executor)
+    st.session_state['job'] = job
+    job.start()
+
+
+def cancel_job():
+    job = st.session_state.get('job')
+    if job is not None and job.active:
+        job.cancel()
+
+
 def cleanup_result_files():
-    _files = list(Path(OUT_DIR).glob('*'))
-    for _f in _files:
-        _f.unlink(missing_ok=True)
+    st.session_state.pop('export_buffers', None)
+    job = st.session_state.get('job')
+    if job is not None and not job.active:
+        st.session_state.pop('job', None)
+
+
+def show_preflight(report: PreflightReport):
+    """pre-flight validation report of the uploaded files"""
+    st.subheader('Pre-flight Check')
+    st.dataframe(report.demand, hide_index=True)
+    _show = {ERROR: st.error, WARNING: st.warning, INFO: st.info}
+    for issue in report.issues:
+        _show[issue.level](issue.message)
+        if issue.rows is not None and not issue.rows.empty:
+            with st.expander(f'{issue.code} ({issue.rows.shape[0]} rows)'):
+                st.dataframe(issue.rows, hide_index=True)
+    st.caption(f"pre-flight: {'OK' if report.ok else 'NG'} ({report.seconds * 1000:.1f} ms)")
+
+
+@st.fragment(run_every=PROGRESS_REFRESH_SECONDS)
+def show_job_progress():
+    """progress of the background job (refreshed periodically)"""
+    job = st.session_state.get('job')
+    if job is None:
+        return
+    if job.active:
+        stage = f"{job.stage} ({job.stage_index + 1}/{job.stage_count})" if job.stage else "starting"
+        if job.cancel_requested:
+            stage += " - cancelling"
+        st.progress(job.progress(), text=stage)
+        st.button(label="Cancel", key="cancel_job", on_click=cancel_job, disabled=job.cancel_requested)
+        return
+    # 終了したジョブの結果をセッションに移して、画面全体を更新する（ダウンロードボタン）
+    if job.status == BackgroundJob.DONE and 'export_buffers' not in st.session_state:
+        # 結果はセッションごとにメモリ上で保持する（他のユーザーの結果と混ざらない）
+        st.session_state['export_buffers'] = job.export_buffers
+        st.rerun()
+    elif job.status == BackgroundJob.CANCELLED:
+        st.warning('cancelled')
+    elif job.status == BackgroundJob.FAILED:
+        st.error(job.error)
+        st.code(job.traceback)
 
 
 # DISPLAY
@@ -25,10 +138,10 @@ st.header('File Upload')
 st.subheader('1. CMS DATA (CSV/UTF-8)')
 _cms_file = st.file_uploader(label="Choose a file", key="cms_data")
 
-st.subheader('2. DONGURI DATA (EXCEL/SHIFT-JIS) - 6辞書')
+st.subheader('2. DONGURI DATA (EXCEL/SHIFT-JIS, or CSV/PARQUET of tmp-cnv) - 6辞書')
 _donguri6_file = st.file_uploader(label="Choose a file", key="d6_data")
 
-st.subheader('3. DONGURI DATA (EXCEL/SHIFT-JIS) - 3辞書')
+st.subheader('3. DONGURI DATA (EXCEL/SHIFT-JIS, or CSV/PARQUET of tmp-cnv) - 3辞書')
 _donguri3_file = st.file_uploader(label="Choose a file", key="d3_data")
 
 st.subheader('4. STUDENT DATA from School Test (CSV/UTF-8)')
@@ -37,16 +150,37 @@ _jyg_file = st.file_uploader(label="Choose a file", key="jyg_data")
 
 st.header('Execution')
 executable = False
-pressed = False
 if (_cms_file is not None) and (_donguri6_file is not None) and (
         _donguri3_file is not None) and (_jyg_file is not None):
     executable = True
 
-if executable is True:
-    executor = ShiraishiExecutor(_cms_file, _donguri6_file, _donguri3_file, _jyg_file)
-    pressed = st.button(label="Execute", key="exec_main", on_click=executor.main_func)
+save_debug_artifacts = st.checkbox(label="Save debug artifacts (./debug)", key="save_debug")
+suggest_candidates = st.checkbox(label="Suggest matching candidates for failed students", key="suggest_candidates")
 
-if pressed == True:
+if executable is True:
+    options = ExecutorOptions(debug_dir="./debug" if save_debug_artifacts else None, out_dir=None,
+                              suggest_candidates=suggest_candidates)
+    digests = [file_digest(_cms_file), file_digest(_donguri6_file), file_digest(_donguri3_file), file_digest(_jyg_file)]
+    executor = ShiraishiExecutor.from_loaded(
+        load_cms_data(digests[0], _cms_file),
+        load_donguri_account(digests[1], _donguri6_file),
+        load_donguri_account(digests[2], _donguri3_file),
+        load_jiyu_students(digests[3], _jyg_file),
+        options)
+    # 実行前に入力を検証し、エラー（アカウント不足など）がある場合は確認してから実行する
+    preflight_report = executor.preflight()
+    show_preflight(preflight_report)
+    run_anyway = preflight_report.ok or st.checkbox(label="Run despite pre-flight errors", key="run_anyway")
+    _job = st.session_state.get('job')
+    st.button(label="Execute", key="exec_main", on_click=execute, args=(job_key(digests, options), executor),
+              disabled=(_job is not None and _job.active) or not run_anyway)
+
+if 'job_message' in st.session_state:
+    st.info(st.session_state['job_message'])
+show_job_progress()
+
+export_buffers = st.session_state.get('export_buffers', {})
+if export_buffers:
     st.write('executed')
 else:
     st.write('not yet')
@@ -57,35 +191,10 @@ st.header('Download Files')
 
 st.button(label="Clear Result", key="clear_result", on_click=cleanup_result_files)
 
-# RESULT
-downloadable_result = False
-if (executable) and (Path(FP_RESULT).exists()):
-    downloadable_result = True
-if downloadable_result:
-    with open(FP_RESULT, 'rb') as f:
-        st.download_button(label=f'download {FN_RESULT}',
-                           data=f,
-                           file_name=FN_RESULT,
-                           key=FN_RESULT)
-
-# FAILED STUDENTS
-downloadable_failed_st = False
-if (executable) and (Path(FP_FAILED_STUDENTS).exists()):
-    downloadable_failed_st = True
-if downloadable_failed_st:
-    with open(FP_FAILED_STUDENTS, 'rb') as f:
-        st.download_button(label=f'download {FN_FAILED_STUDENTS}',
-                           data=f,
-                           file_name=FN_FAILED_STUDENTS,
-                           key=FN_FAILED_STUDENTS)
-
-# REST DONGURI ACCOUNTS
-downloadable_rest_acc = False
-if (executable) and (Path(FP_REST_DONGURI_ACC).exists()):
-    downloadable_rest_acc = True
-if downloadable_rest_acc:
-    with open(FP_REST_DONGURI_ACC, 'rb') as f:
-        st.download_button(label=f'download {FN_REST_DONGURI_ACC}',
-                           data=f,
-                           file_name=FN_REST_DONGURI_ACC,
-                           key=FN_REST_DONGURI_ACC)
+# RESULT / FAILED STUDENTS / REST DONGURI ACCOUNTS
+if executable:
+    for file_name, data in export_buffers.items():
+        st.download_button(label=f'download {file_name}',
+                           data=data,
+                           file_name=file_name,
+                           key=file_name)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# `src` パッケージをリポジトリのルートから import する（pytest をどのディレクトリから実行しても同じ）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,31 @@
+"""tmp-cnv の出力形式（xlsx / csv / parquet）と DonguriAccount の読み込み"""
+
+import pandas as pd
+import pytest
+
+from src.account_convert import ACCOUNT_NOTE_COL, DIC_TYPE_RULES, convert_accounts
+from src.executor import DonguriAccount
+from src.synth import generate_accounts
+
+
+@pytest.fixture
+def converted(tmp_path):
+    """format -> convert_accounts の結果（同じ入力を各形式で出力する）"""
+    accounts = generate_accounts(30, "u")
+    accounts[ACCOUNT_NOTE_COL] = list(DIC_TYPE_RULES.values()) * 15
+    accounts.loc[3, "グループ名"] = None
+    input_path = tmp_path / "accounts_2022.csv"
+    accounts.to_csv(input_path, index=False, encoding="utf-8")
+    return {fmt: convert_accounts(str(input_path), str(tmp_path / "out"), fmt) for fmt in ("xlsx", "csv", "parquet")}
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+@pytest.mark.parametrize("fast_load", [False, True])
+def test_load_matches_xlsx(converted, fmt, fast_load):
+    for dic_type in DIC_TYPE_RULES:
+        expected = DonguriAccount(str(converted["xlsx"][dic_type]["path"]), fast_load).data
+        pd.testing.assert_frame_equal(DonguriAccount(str(converted[fmt][dic_type]["path"]), fast_load).data,
+                                      expected, check_exact=True)
+        # アップロードされたファイル（名前付きのファイルオブジェクト）も拡張子で形式を判定する
+        with open(converted[fmt][dic_type]["path"], "rb") as file:
+            pd.testing.assert_frame_equal(DonguriAccount(file, fast_load).data, expected, check_exact=True)
@@ -0,0 +1,59 @@
+"""DataFrame backends (src.backends) の結果が pandas と一致することを確認する"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("polars")
+
+from src.backends import PandasBackend, PolarsBackend
+from src.bench import compare_backends
+from src.executor import ExecutorOptions
+from src.synth import generate_inputs
+
+
+@pytest.fixture(scope="module")
+def synth_paths(tmp_path_factory):
+    return generate_inputs(3000, str(tmp_path_factory.mktemp("synth")), seed=1)
+
+
+@pytest.mark.parametrize("options", [
+    ExecutorOptions(out_dir=None),
+    ExecutorOptions(out_dir=None, fast_donguri_load=True, newbie_only_ingest=True),
+], ids=["default", "fast_load"])
+def test_compare_backends(synth_paths, options):
+    result = compare_backends(synth_paths, options)
+    assert result["mismatches"] == []
+
+
+@pytest.fixture
+def keys():
+    return pd.DataFrame({
+        "key": pd.array(["a", None, "b", "a", None, "c"], dtype="string"),
+        "cat": pd.Categorical(["x", "y", "x", "x", None, "y"]),
+        "value": np.arange(6),
+    }, index=[10, 11, 12, 13, 14, 15])
+
+
+def test_drop_duplicates(keys):
+    for subset in (["key"], ["key", "cat"]):
+        pd.testing.assert_frame_equal(PolarsBackend().drop_duplicates(keys, subset),
+                                      PandasBackend().drop_duplicates(keys, subset))
+
+
+def test_merge_left(keys):
+    right = pd.DataFrame({"right_key": pd.array(["a", None, "c", "d"], dtype="string"), "right_value": [1, 2, 3, 4]})
+    pd.testing.assert_frame_equal(PolarsBackend().merge_left(keys, right, "key", "right_key"),
+                                  PandasBackend().merge_left(keys, right, "key", "right_key"))
+
+
+def test_split(keys):
+    for expected, actual in zip(PandasBackend().split(keys, "cat", ["x", "y", "z"]),
+                                PolarsBackend().split(keys, "cat", ["x", "y", "z"])):
+        pd.testing.assert_frame_equal(actual, expected)
+
+
+@pytest.mark.parametrize("values", [["a", "c"], ["a", None], []])
+def test_isin(keys, values):
+    np.testing.assert_array_equal(PolarsBackend().isin(keys["key"], values),
+                                  PandasBackend().isin(keys["key"], values))
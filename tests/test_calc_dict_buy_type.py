@@ -0,0 +1,80 @@
+"""CmsData.calc_dict_buy_type（ベクトル化）の結果が、ベクトル化する前の生徒ごとのループと一致することを確認する"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.executor import CmsData, CmsDataCols, DICTYPE_COL_NAME, PROD_NAME_DIC3, PROD_NAME_DIC6
+from src.synth import generate_cms
+
+
+def calc_dict_buy_type_reference(cms_data: CmsData) -> pd.DataFrame:
+    """the per-student loop before vectorization (reference)
+
+        - 生徒ごとの注文の絞り込み（`data[学籍番号 == student_id]`）を辞書の lookup に置き換えた以外は同じ
+            - `==` は欠損値にマッチしないため、学籍番号が欠損の生徒には注文がない（→ 購入しない）
+    """
+    cols, dictype, data = cms_data.cols, cms_data.dictype, cms_data.data
+    orders = {}
+    for student_id, prod_name in zip(data[cols.student_id], data[cols.prod_name]):
+        if not pd.isna(student_id) and not pd.isna(prod_name):
+            orders.setdefault(student_id, set()).add(prod_name)
+
+    uniq_student_id = data[cols.student_id].unique()
+    dictype_by_uniq_students = []
+    for student_id in uniq_student_id:
+        student_orders = set() if pd.isna(student_id) else orders.get(student_id, set())
+        if PROD_NAME_DIC6 in student_orders:
+            dictype_by_uniq_students.append(dictype.DIC_6)
+        elif PROD_NAME_DIC3 in student_orders:
+            dictype_by_uniq_students.append(dictype.DIC_3)
+        else:
+            dictype_by_uniq_students.append(dictype.DIC_NONE)
+
+    co_student_id_col = 'co_student_id'
+    _df_id_dictype = pd.DataFrame(
+        data={
+            co_student_id_col: uniq_student_id,
+            DICTYPE_COL_NAME: dictype_by_uniq_students}
+        )
+    squashed_data = data.copy()
+    squashed_data = squashed_data.drop_duplicates(subset=[cols.student_id])
+    return pd.merge(
+        left=squashed_data,
+        right=_df_id_dictype,
+        left_on=cols.student_id,
+        right_on=co_student_id_col,
+        how='left')
+
+
+@pytest.fixture(scope="module")
+def cms_csv(tmp_path_factory):
+    """generated CMS orders (100k+), some students order both dictionaries"""
+    cols = CmsDataCols()
+    cms = generate_cms(50000, seed=0)
+    # 辞書の購入者の一部に、もう一方の辞書の注文を追加する
+    both = cms[cms[cols.prod_name].isin([PROD_NAME_DIC6, PROD_NAME_DIC3])].sample(frac=0.1, random_state=0)
+    both = both.assign(**{cols.prod_name: np.where(both[cols.prod_name] == PROD_NAME_DIC6, PROD_NAME_DIC3,
+                                                   PROD_NAME_DIC6)})
+    cms = pd.concat([cms, both]).sample(frac=1.0, random_state=1)
+    cms[cols.id] = np.arange(1, cms.shape[0] + 1)
+    assert cms.shape[0] >= 100000
+    path = tmp_path_factory.mktemp("cms") / "cms.csv"
+    cms.to_csv(path, header=False, index=False, encoding="utf-8")
+    return path
+
+
+def test_calc_dict_buy_type_matches_reference(cms_csv):
+    cms_data = CmsData(str(cms_csv))
+    cols = cms_data.cols
+    # 学籍番号・メールアドレスがともに空の注文（仮IDも割り振られない）
+    _no_id = cms_data.data.index[::97]
+    cms_data.data.loc[_no_id, cols.student_id] = pd.NA
+    assert cms_data.data.loc[_no_id, cols.prod_name].isin([PROD_NAME_DIC6, PROD_NAME_DIC3]).any()
+    _per_student = cms_data.data.groupby(cols.student_id)[cols.prod_name]
+    assert (_per_student.agg(lambda names: {PROD_NAME_DIC6, PROD_NAME_DIC3} <= set(names))).any()
+
+    expected = calc_dict_buy_type_reference(cms_data)
+    cms_data.calc_dict_buy_type()
+
+    pd.testing.assert_frame_equal(cms_data.data, expected)
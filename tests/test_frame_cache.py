@@ -0,0 +1,68 @@
+"""FrameCache（src.frame_cache）から読み込んだ結果が、パースした結果と同じことを確認する"""
+
+import io
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from src.executor import DonguriAccount, load_cached
+from src.frame_cache import FrameCache
+from src.synth import generate_accounts
+
+
+def _load_twice(cache, key, frames):
+    """get_or_load twice (miss -> hit or miss) and return (loaded, number of load calls)"""
+    calls = []
+
+    def load():
+        calls.append(1)
+        return frames
+
+    results = [cache.get_or_load(key, "test", load, lambda loaded: loaded, lambda cached: cached) for _ in range(2)]
+    return results, len(calls)
+
+
+def test_cached_frames_equal_fresh_load(tmp_path):
+    cache = FrameCache(str(tmp_path / "cache"))
+    frames = {
+        "data": pd.DataFrame({
+            "text": pd.array(["a", None, "c"], dtype="string"),
+            "category": pd.Categorical(["x", "y", None]),
+            "number": [1.5, None, 3.0],
+        }, index=[3, 5, 7]),
+        "empty": pd.DataFrame({"text": pd.array([], dtype="string")}),
+    }
+    (first, second), calls = _load_twice(cache, cache.key("test", "digest"), frames)
+    assert calls == 1
+    for name, frame in frames.items():
+        pd.testing.assert_frame_equal(second[name], frame, check_exact=True)
+
+
+@pytest.mark.parametrize("mixed", [
+    [1, "a", 2],
+    [pd.Timestamp("2022-04-01"), "a", pd.Timestamp("2022-04-02")],
+], ids=["int_str", "datetime_str"])
+def test_mixed_object_column_is_not_cached(tmp_path, mixed):
+    cache = FrameCache(str(tmp_path / "cache"))
+    frames = {"data": pd.DataFrame({"text": ["a", "b", "c"], "mixed": pd.Series(mixed, dtype=object)})}
+    (first, second), calls = _load_twice(cache, cache.key("test", "digest"), frames)
+    assert calls == 2
+    pd.testing.assert_frame_equal(second["data"], frames["data"], check_exact=True)
+
+
+def test_donguri_account_with_mixed_columns(tmp_path):
+    """DONGURI workbook with extra columns (int/str, datetime/str): cached load == parsed load"""
+    accounts = generate_accounts(4, "u").assign(
+        備考=pd.Series([1, "a", 2, "b"], dtype=object),
+        配布日=pd.Series([pd.Timestamp("2022-04-01"), "未配布", pd.Timestamp("2022-04-02"), None], dtype=object))
+    path = tmp_path / "donguri.xlsx"
+    accounts.to_excel(path, index=False)
+
+    cache = FrameCache(str(tmp_path / "cache"))
+    expected = DonguriAccount(str(path)).data
+    for _ in range(2):
+        loaded = load_cached(cache, "donguri", str(path), {}, DonguriAccount, DonguriAccount.to_frames,
+                             DonguriAccount.from_frames)
+        pd.testing.assert_frame_equal(loaded.data, expected, check_exact=True)
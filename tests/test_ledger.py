@@ -0,0 +1,114 @@
+"""アカウント割り当て台帳（src.ledger, ExecutorOptions.ledger_path）"""
+
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from src.executor import (DICTYPE_COL_NAME, DonguriAccCols, ExecutorOptions, JiyuStuCols, LedgerAccountMissing,
+                          LedgerDuplicatedExamId, ShiraishiExecutor, buying_dic_type)
+from src.ledger import AccountLedger
+from src.synth import generate_inputs
+
+USER_NAME = DonguriAccCols().user_name
+EXAM_ID = JiyuStuCols().exam_id
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    return generate_inputs(300, str(tmp_path / "inputs"), seed=2)
+
+
+def run(paths, ledger_path, **overrides):
+    """run the pipeline and return the executor (overrides: 入力の差し替え name -> path)"""
+    paths = {**paths, **overrides}
+    with open(paths["cms"], "rb") as cms, open(paths["dic6"], "rb") as dic6, open(paths["dic3"], "rb") as dic3, \
+            open(paths["schooltest"], "rb") as schooltest, contextlib.redirect_stdout(io.StringIO()):
+        executor = ShiraishiExecutor(cms, dic6, dic3, schooltest,
+                                     ExecutorOptions(out_dir=None, ledger_path=str(ledger_path)))
+        executor.main_func()
+    return executor
+
+
+def assignments(executor, dic_type=buying_dic_type.DIC_6):
+    """テスト番号 -> ユーザー名 of the buyers of dic_type"""
+    buyers = executor.cms_jyg_acc[executor.cms_jyg_acc[DICTYPE_COL_NAME] == dic_type]
+    return dict(zip(buyers[EXAM_ID], buyers[USER_NAME]))
+
+
+def test_record_keeps_user_name_and_updates_student_id(tmp_path):
+    with AccountLedger(str(tmp_path / "ledger.db")) as ledger:
+        ledger.record("6dic", [("E1", "S1", "u1"), ("E2", "S2", "u2")])
+        ledger.record("6dic", [("E1", "S1-new", "u9")])
+        assert ledger.lookup("6dic") == {"E1": ("u1", "S1-new"), "E2": ("u2", "S2")}
+        assert ledger.used_user_names("6dic") == {"u1", "u2"}
+        assert ledger.lookup("3dic") == {}
+
+
+def test_rerun_keeps_assignments(inputs, tmp_path):
+    ledger_path = tmp_path / "ledger.db"
+    first = run(inputs, ledger_path)
+    second = run(inputs, ledger_path)
+    assert assignments(first) and assignments(second) == assignments(first)
+    pd.testing.assert_frame_equal(second.cms_jyg_acc, first.cms_jyg_acc)
+    assert second.summary()["rest_accounts_6dic"] == first.summary()["rest_accounts_6dic"]
+
+
+def test_new_students_get_unused_accounts(inputs, tmp_path):
+    ledger_path = tmp_path / "ledger.db"
+    schooltest = pd.read_csv(inputs["schooltest"], dtype=str)
+    # 1回目は学校のデータの半分だけ、2回目は全員
+    half = tmp_path / "schooltest_half.csv"
+    schooltest.iloc[: schooltest.shape[0] // 2].to_csv(half, index=False)
+    first = assignments(run(inputs, ledger_path, schooltest=half))
+    second = assignments(run(inputs, ledger_path))
+
+    assert {exam_id: second[exam_id] for exam_id in first} == first
+    new_user_names = [user_name for exam_id, user_name in second.items() if exam_id not in first]
+    assert new_user_names and not set(new_user_names) & set(first.values())
+    assert len(set(second.values())) == len(second)
+
+
+def test_removed_students_accounts_are_not_reused(inputs, tmp_path):
+    ledger_path = tmp_path / "ledger.db"
+    first = assignments(run(inputs, ledger_path))
+    schooltest = pd.read_csv(inputs["schooltest"], dtype=str)
+    removed = next(iter(first))
+    without = tmp_path / "schooltest_without.csv"
+    schooltest[schooltest[EXAM_ID] != removed].to_csv(without, index=False)
+    second = run(inputs, ledger_path, schooltest=without)
+    assert first[removed] not in set(assignments(second).values())
+    assert first[removed] not in set(second._dongri_data_6dic.get_rest_of()[USER_NAME])
+
+
+def test_changed_student_id_is_recorded(inputs, tmp_path):
+    ledger_path = tmp_path / "ledger.db"
+    first = assignments(run(inputs, ledger_path))
+    exam_id = next(iter(first))
+    with AccountLedger(str(ledger_path)) as ledger:
+        ledger.record(buying_dic_type.DIC_6, [(exam_id, "OLD", first[exam_id])])
+    assert assignments(run(inputs, ledger_path)) == first
+    with AccountLedger(str(ledger_path)) as ledger:
+        assert ledger.lookup(buying_dic_type.DIC_6)[exam_id] == (first[exam_id], exam_id)
+
+
+def test_missing_account_raises(inputs, tmp_path):
+    ledger_path = tmp_path / "ledger.db"
+    first = assignments(run(inputs, ledger_path))
+    accounts = pd.read_excel(inputs["dic6"], dtype=str)
+    missing = tmp_path / "dic6_missing.xlsx"
+    accounts[accounts[USER_NAME] != next(iter(first.values()))].to_excel(missing, index=False)
+    with pytest.raises(LedgerAccountMissing):
+        run(inputs, ledger_path, dic6=missing)
+
+
+def test_duplicated_exam_id_raises(inputs, tmp_path):
+    ledger_path = tmp_path / "ledger.db"
+    schooltest = pd.read_csv(inputs["schooltest"], dtype=str)
+    duplicated = tmp_path / "schooltest_duplicated.csv"
+    pd.concat([schooltest, schooltest.iloc[[0]]]).to_csv(duplicated, index=False)
+    with pytest.raises(LedgerDuplicatedExamId):
+        run(inputs, ledger_path, schooltest=duplicated)
+    with AccountLedger(str(ledger_path)) as ledger:
+        assert ledger.lookup(buying_dic_type.DIC_6) == {}
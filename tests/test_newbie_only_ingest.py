@@ -0,0 +1,41 @@
+"""CmsData(newbie_only=True) の結果が、全体を読み込んでから新入生を抽出した場合と同じことを確認する"""
+
+import pandas as pd
+import pytest
+
+from src.executor import VIRTUAL_ID_PREFIX, CmsData, CmsDataCols, ExecutorOptions, ShiraishiExecutor
+from src.synth import SynthConfig, generate_inputs
+
+COLS = CmsDataCols()
+
+
+@pytest.fixture(scope="module")
+def inputs(tmp_path_factory):
+    # 学籍番号が空の生徒・重複注文を多めにして、チャンクをまたぐ重複除去と仮IDの番号を確認する
+    config = SynthConfig(empty_id_ratio=0.1, duplicate_order_ratio=0.1)
+    return generate_inputs(5000, str(tmp_path_factory.mktemp("inputs")), seed=3, config=config)
+
+
+@pytest.mark.parametrize("chunksize", [1000, 97, 10 ** 6])
+def test_newbie_only_matches_full_ingest(inputs, chunksize):
+    full = CmsData(str(inputs["cms"]))
+    newbie = CmsData(str(inputs["cms"]), newbie_only=True, chunksize=chunksize)
+
+    expected = full.data[(full.data[COLS.cur_school_year] == 0).fillna(False).to_numpy()][newbie.data.columns]
+    assert newbie.data[COLS.student_id].str.startswith(VIRTUAL_ID_PREFIX).any()
+    pd.testing.assert_frame_equal(newbie.data, expected, check_exact=True)
+
+
+def test_newbie_only_pipeline_results(inputs):
+    def results(newbie_only):
+        with open(inputs["cms"], "rb") as cms, open(inputs["dic6"], "rb") as dic6, \
+                open(inputs["dic3"], "rb") as dic3, open(inputs["schooltest"], "rb") as schooltest:
+            executor = ShiraishiExecutor(cms, dic6, dic3, schooltest,
+                                         ExecutorOptions(out_dir=None, newbie_only_ingest=newbie_only))
+            executor.main_func()
+        return executor.result_workbooks()
+
+    expected, actual = results(False), results(True)
+    for file_name, sheets in expected.items():
+        for sheet_name, data in sheets.items():
+            pd.testing.assert_frame_equal(actual[file_name][sheet_name], data, check_exact=True)
@@ -1,48 +1,96 @@
 from pathlib import Path
 
-import chardet
 import click
-import pandas as pd
-import pdfkit
-
-from src.executor import ShiraishiExecutor
-from src.executor import StatsManager
 
 
 @click.group(name="tb", help="Toolbox cli")
-def tb():
-    pass
+@click.option("--daemon", type=str, envvar="TB_DAEMON",
+              help="Send jobs (emulator / stats / to-utf8 -i) to the worker daemon at this URL (env: TB_DAEMON)")
+@click.pass_context
+def tb(ctx, daemon: str):
+    ctx.ensure_object(dict)
+    ctx.obj["daemon"] = daemon
 
-@tb.command(name="to-utf8", help="Convert a csv file to utf8")
-@click.option("--input", "-i", type=str, help="Input file", required=True)
+
+def daemon_url() -> str:
+    """URL of the worker daemon (None: run jobs in this process)"""
+    return click.get_current_context().find_root().obj.get("daemon")
+
+
+def frame_cache_dir(cache_dir: str, no_cache: bool):
+    """cache_dir of ExecutorOptions (None: do not use the frame cache)"""
+    if no_cache:
+        return None
+    if cache_dir is not None:
+        return cache_dir
+    from src.frame_cache import FRAME_CACHE_DIR
+
+    return FRAME_CACHE_DIR
+
+
+def run_on_daemon(job_type: str, args: dict) -> dict:
+    """run a job on the worker daemon and echo its output"""
+    from src.daemon_client import DaemonError, run_remote
+
+    try:
+        status = run_remote(daemon_url(), job_type, args)
+    except DaemonError as e:
+        raise click.ClickException(str(e))
+    click.echo(status["output"], nl=False)
+    return status["result"]
+
+@tb.command(name="to-utf8", help="Convert csv files to utf8")
+@click.option("--input", "-i", type=str, help="Input file")
 @click.option("--output", "-o", type=str, help="Output file (default: input.utf8.csv)")
-def to_utf8(input: str, output: str):
+@click.option("--input-dir", type=str, help="Convert all files matching --pattern in this directory")
+@click.option("--pattern", type=str, default="*.csv", show_default=True, help="Glob pattern of --input-dir")
+@click.option("--out-dir", type=str, help="Output directory of --input-dir (default: same as the input files)")
+@click.option("--workers", "-w", type=int, help="Number of worker processes (default: number of CPUs)")
+def to_utf8(input: str, output: str, input_dir: str, pattern: str, out_dir: str, workers: int):
     """
-    Convert a csv file to utf8
+    Convert csv files to utf8
     """
-    encoding = ""
-    with open(input, "rb") as f:
-        result = chardet.detect(f.read())
-        click.echo(f"input file encoding --> {result}")
-        encoding = result["encoding"]
+    from src.transcode import convert_file, convert_files, find_inputs
 
-    if encoding == "utf-8":
-        click.echo("input file is already utf8")
-        return
+    if (input is None) == (input_dir is None):
+        raise click.UsageError("specify either --input or --input-dir")
 
-    df = pd.read_csv(input, encoding=encoding)
-    output_path = output if output is not None else ".".join([input, "utf8.csv"])
-    df.to_csv(output_path, encoding="utf-8", index=False)
+    if input is not None and daemon_url() is not None:
+        results = run_on_daemon("to-utf8", {"input": input, "output": output})["results"]
+    elif input is not None:
+        results = [convert_file(input, output)]
+    else:
+        results = convert_files(find_inputs(input_dir, pattern), out_dir, workers)
+
+    for result in results:
+        click.echo(f"{result['input']}: encoding={result['encoding']} (confidence={result['confidence']:.2f}) "
+                   f"--> {result['status']}" + (f" {result['output']}" if result['output'] else "")
+                   + (f" {result['error']}" if result['error'] else ""))
     click.echo("Done")
 
 
 @tb.command(name="export-list", help="Export the result of matching list to pdf")
 @click.option("--input", "-i", type=str, help="Input file", required=True)
-def export_list(input: str):
+@click.option("--split-by-class", is_flag=True, help="Export one pdf per course / class (converted concurrently)")
+@click.option("--out-dir", "-o", type=str, default="./list", show_default=True, help="Output directory of --split-by-class")
+@click.option("--workers", "-w", type=int, help="Number of concurrent conversions of --split-by-class")
+@click.option("--merged", is_flag=True, help="Also export all classes into one pdf (with --split-by-class)")
+def export_list(input: str, split_by_class: bool, out_dir: str, workers: int, merged: bool):
     """
     Export the result of matching list to pdf
     """
+    import pandas as pd
+    import pdfkit
+
     df = pd.read_csv(input)
+    if split_by_class:
+        from src.pdf_export import export_by_class
+
+        for pdf_path in export_by_class(df, out_dir, workers, merged):
+            click.echo(f"{pdf_path}")
+        click.echo("Done")
+        return
+
     df.to_html("list.html")
     pdfkit.from_file("list.html", "list.pdf")
     click.echo("Done")
@@ -54,6 +102,8 @@ def test(input: str):
     """
     Test
     """
+    import pdfkit
+
     click.echo(input)
     a, b = input
     pdfkit.from_file(["list.html", "list2.html"], "list-2.pdf")
@@ -62,66 +112,456 @@ def test(input: str):
 
 @tb.command(name='tmp-cnv')
 @click.option("--input", "-i", type=str, help="Input file", required=True)
-def tmp_cnv(input: str):
+@click.option("--format", "-f", "fmt", type=click.Choice(["xlsx", "csv", "parquet"]), default="xlsx", show_default=True,
+              help="Output format (parquet requires pyarrow). All formats can be used as -id6 / -id3 of emulator etc.")
+@click.option("--out-dir", "-o", type=str, help="Output directory (default: same as the input file)")
+@click.option("--chunksize", type=int, default=50_000, show_default=True, help="Rows per chunk")
+def tmp_cnv(input: str, fmt: str, out_dir: str, chunksize: int):
     """
     Transform 2022 fmt --> 2021 fmt
     DONGURI account csv
 
         This is Temporary function.
     """
-    # load
-    click.echo(f"load ... {input}")
-    df_2022fmt = pd.read_csv(input)
+    from src.account_convert import convert_accounts
 
-    # split 6dic/3dic
-    df_2022fmt_6dic = df_2022fmt[df_2022fmt['備考'].str.contains('ジーニアス５辞書')].copy()
-    df_2022fmt_3dic = df_2022fmt[df_2022fmt['備考'].str.contains('ジーニアス英和/和英')].copy()
-
-    # extract columns to export
-    target_cols_2021fmt = ['ユーザー名', 'グループ名', '一時パスワード']
-    df_2021fmt_6dic = df_2022fmt_6dic[target_cols_2021fmt].copy()
-    df_2021fmt_3dic = df_2022fmt_3dic[target_cols_2021fmt].copy()
-
-    # export
-    odir = Path(input).parent
-    fstem = Path(input).stem
-
-    df_2021fmt_6dic.to_excel(odir / f"{fstem}_6dic.xlsx", index=False)
-    df_2021fmt_3dic.to_excel(odir / f"{fstem}_3dic.xlsx", index=False)
+    click.echo(f"load ... {input}")
+    for dic_type, output in convert_accounts(input, out_dir, fmt, chunksize=chunksize).items():
+        click.echo(f"{dic_type}: {output['rows']} rows --> {output['path']}")
 
     click.echo("Done")
 
 
 @tb.command(name='emulator')
 @click.option("--input-cms", "-ic", type=str, help="Input file - CMS Data (CSV/UTF-8)", required=True)
-@click.option("--input-dic6", "-id6", type=str, help="Input file - Dict Accounts 6dic (xlsx)", required=True)
-@click.option("--input-dic3", "-id3", type=str, help="Input file - Dict Accounts 3dic (xlsx)", required=True)
+@click.option("--input-dic6", "-id6", type=str, help="Input file - Dict Accounts 6dic (xlsx, or csv / parquet of tmp-cnv)", required=True)
+@click.option("--input-dic3", "-id3", type=str, help="Input file - Dict Accounts 3dic (xlsx, or csv / parquet of tmp-cnv)", required=True)
 @click.option("--input-schooltest", "-ist", type=str, help="Input file - School Test Data (CSV/UTF-8)", required=True)
-def emulator(input_cms: str, input_dic6: str, input_dic3: str, input_schooltest: str):
+@click.option("--debug-dir", type=str, help="Save intermediate data (debug artifacts) under this directory")
+@click.option("--fast-export", is_flag=True, help="Write result workbooks in write-only mode, concurrently")
+@click.option("--fast-donguri-load", is_flag=True, help="Load only the account columns of DONGURI workbooks, as strings")
+@click.option("--ledger", type=str, help="Account allocation ledger (SQLite). Keeps assignments stable across re-runs")
+@click.option("--newbie-only-ingest", is_flag=True, help="Read CMS Data in chunks, keeping only newbie rows at read time")
+@click.option("--suggest-candidates", is_flag=True,
+              help="Add ranked CMS candidates (name / kana / id similarity) of failed students to the failed list")
+@click.option("--low-memory", is_flag=True, help="Enable pandas copy-on-write to avoid intermediate copies (lower peak memory)")
+@click.option("--cache-dir", type=str, help="Cache of prepped input data (default: ./cache/frames)")
+@click.option("--no-cache", is_flag=True, help="Always parse the input files (do not use the cache)")
+@click.option("--backend", type=click.Choice(["pandas", "polars"]), default="pandas", show_default=True,
+              help="DataFrame backend of dedupe / merge / splits (polars: multi-threaded, requires polars)")
+def emulator(input_cms: str, input_dic6: str, input_dic3: str, input_schooltest: str, debug_dir: str, fast_export: bool,
+             fast_donguri_load: bool, ledger: str, newbie_only_ingest: bool, suggest_candidates: bool, low_memory: bool,
+             cache_dir: str, no_cache: bool, backend: str):
     """Streamlit App Emulator"""
+    option_args = dict(debug_dir=debug_dir, fast_export=fast_export, fast_donguri_load=fast_donguri_load,
+                       ledger_path=ledger, newbie_only_ingest=newbie_only_ingest,
+                       suggest_candidates=suggest_candidates, low_memory=low_memory,
+                       cache_dir=frame_cache_dir(cache_dir, no_cache), backend=backend)
+    if daemon_url() is not None:
+        summary = run_on_daemon("emulator", {
+            "input_cms": input_cms, "input_dic6": input_dic6, "input_dic3": input_dic3,
+            "input_schooltest": input_schooltest, "options": option_args})
+        click.echo(f"summary: {summary}")
+        click.echo("Done")
+        return
+
+    from src.executor import ExecutorOptions, LedgerError, ShiraishiExecutor
+
     _cms_file = open(input_cms, "rb")
     _donguri6_file = open(input_dic6, "rb")
     _donguri3_file = open(input_dic3, "rb")
     _schooltest_file = open(input_schooltest, "rb")
 
-    executor = ShiraishiExecutor(_cms_file, _donguri6_file, _donguri3_file, _schooltest_file)
+    options = ExecutorOptions(**option_args)
+    executor = ShiraishiExecutor(_cms_file, _donguri6_file, _donguri3_file, _schooltest_file, options)
     click.echo(f"executor created")
     click.echo(f"start to execute main process")
-    executor.main_func()
+    try:
+        executor.main_func()
+    except LedgerError as e:
+        raise click.ClickException(str(e))
     click.echo("Done")
 
 
-@tb.command(name='stats', help="Show statistics of the input file (rakubuy order, CSV/UTF8)")
-@click.option("--input", "-i", type=str, help="Input file", required=True)
-def stats(input: str):
+@tb.command(name='preflight', help="Validate the input files before running the linking process (exit 1 on errors)")
+@click.option("--input-cms", "-ic", type=str, help="Input file - CMS Data (CSV/UTF-8)", required=True)
+@click.option("--input-dic6", "-id6", type=str, help="Input file - Dict Accounts 6dic (xlsx, or csv / parquet of tmp-cnv)", required=True)
+@click.option("--input-dic3", "-id3", type=str, help="Input file - Dict Accounts 3dic (xlsx, or csv / parquet of tmp-cnv)", required=True)
+@click.option("--input-schooltest", "-ist", type=str, help="Input file - School Test Data (CSV/UTF-8)", required=True)
+@click.option("--json-out", type=str, help="Write the report as JSON to this file")
+@click.option("--fast-donguri-load", is_flag=True, help="Load only the account columns of DONGURI workbooks, as strings")
+@click.option("--newbie-only-ingest", is_flag=True, help="Read CMS Data in chunks, keeping only newbie rows at read time")
+@click.option("--cache-dir", type=str, help="Cache of prepped input data (default: ./cache/frames)")
+@click.option("--no-cache", is_flag=True, help="Always parse the input files (do not use the cache)")
+def preflight(input_cms: str, input_dic6: str, input_dic3: str, input_schooltest: str, json_out: str,
+              fast_donguri_load: bool, newbie_only_ingest: bool, cache_dir: str, no_cache: bool):
+    """
+    Validate the input files before running the linking process (exit 1 on errors)
+    """
+    import json
+    import sys
+
+    from src.executor import ExecutorOptions, ShiraishiExecutor
+
+    options = ExecutorOptions(out_dir=None, fast_donguri_load=fast_donguri_load, newbie_only_ingest=newbie_only_ingest,
+                              cache_dir=frame_cache_dir(cache_dir, no_cache))
+    with open(input_cms, "rb") as cms, open(input_dic6, "rb") as dic6, open(input_dic3, "rb") as dic3, \
+            open(input_schooltest, "rb") as schooltest:
+        executor = ShiraishiExecutor(cms, dic6, dic3, schooltest, options)
+    report = executor.preflight()
+
+    click.echo(report.format_text())
+    click.echo(f"load: {sum(record.seconds for record in executor.profiler.records) * 1000:.1f} ms")
+    if json_out is not None:
+        Path(json_out).write_text(json.dumps(report.to_dict(), ensure_ascii=False, indent=2, default=str),
+                                  encoding="utf-8")
+    if not report.ok:
+        sys.exit(1)
+
+
+@tb.command(name='stats', help="Show statistics of the input files (rakubuy order, CSV/UTF8)")
+@click.option("--input", "-i", type=str, multiple=True, help="Input file (repeatable)", required=True)
+@click.option("--json-out", type=str, help="Write the statistics as JSON to this file (default: print JSON to stdout)")
+@click.option("--csv-out", type=str, help="Write the statistics as CSV (1 row per input file) to this file")
+@click.option("--cache-dir", type=str, help="Cache of prepped input data (default: ./cache/frames)")
+@click.option("--no-cache", is_flag=True, help="Always parse the input files (do not use the cache)")
+def stats(input, json_out: str, csv_out: str, cache_dir: str, no_cache: bool):
+    """
+    Show statistics of the input files (rakubuy order, CSV/UTF8)
+    """
+    import contextlib
+    import json
+    import sys
+
+    # 集計中の出力は stderr に回し、stdout には JSON だけを出す
+    # （デーモンを使う場合、pandas は CSV を出力するときだけ読み込む）
+    stats_result = None
+    with contextlib.redirect_stdout(sys.stderr):
+        if daemon_url() is not None:
+            stats_records = run_on_daemon(
+                "stats", {"inputs": list(input), "cache_dir": frame_cache_dir(cache_dir, no_cache)})["stats"]
+        else:
+            from src.executor import aggregate_cms_files
+
+            stats_result = aggregate_cms_files(list(input), frame_cache_dir(cache_dir, no_cache))
+            stats_records = stats_result.to_dict(orient="records")
+
+    if csv_out is not None:
+        if stats_result is None:
+            import pandas as pd
+
+            stats_result = pd.DataFrame(stats_records)
+        stats_result.to_csv(csv_out, index=False)
+    stats_json = json.dumps(stats_records, ensure_ascii=False, indent=2)
+    if json_out is not None:
+        Path(json_out).write_text(stats_json, encoding="utf-8")
+    elif csv_out is None:
+        click.echo(stats_json)
+
+
+@tb.command(name='profile', help="Run the linking process and print the per-stage time / memory / rows breakdown")
+@click.option("--input-cms", "-ic", type=str, help="Input file - CMS Data (CSV/UTF-8)", required=True)
+@click.option("--input-dic6", "-id6", type=str, help="Input file - Dict Accounts 6dic (xlsx, or csv / parquet of tmp-cnv)", required=True)
+@click.option("--input-dic3", "-id3", type=str, help="Input file - Dict Accounts 3dic (xlsx, or csv / parquet of tmp-cnv)", required=True)
+@click.option("--input-schooltest", "-ist", type=str, help="Input file - School Test Data (CSV/UTF-8)", required=True)
+@click.option("--json-out", type=str, help="Write the report as JSON to this file (default: print JSON to stdout)")
+@click.option("--fast-export", is_flag=True, help="Write result workbooks in write-only mode, concurrently")
+@click.option("--fast-donguri-load", is_flag=True, help="Load only the account columns of DONGURI workbooks, as strings")
+@click.option("--newbie-only-ingest", is_flag=True, help="Read CMS Data in chunks, keeping only newbie rows at read time")
+@click.option("--low-memory", is_flag=True, help="Enable pandas copy-on-write to avoid intermediate copies (lower peak memory)")
+@click.option("--backend", type=click.Choice(["pandas", "polars"]), default="pandas", show_default=True,
+              help="DataFrame backend of dedupe / merge / splits (polars: multi-threaded, requires polars)")
+def profile(input_cms: str, input_dic6: str, input_dic3: str, input_schooltest: str, json_out: str,
+            fast_export: bool, fast_donguri_load: bool, newbie_only_ingest: bool, low_memory: bool, backend: str):
+    """
+    Run the linking process and print the per-stage time / memory / rows breakdown
+    """
+    import contextlib
+    import sys
+
+    from src.executor import ExecutorOptions, ShiraishiExecutor
+
+    options = ExecutorOptions(out_dir=None, fast_export=fast_export, fast_donguri_load=fast_donguri_load,
+                              newbie_only_ingest=newbie_only_ingest, low_memory=low_memory, backend=backend)
+    # 実行中の出力は stderr に回し、stdout にはレポートだけを出す
+    with contextlib.redirect_stdout(sys.stderr), open(input_cms, "rb") as cms, open(input_dic6, "rb") as dic6, \
+            open(input_dic3, "rb") as dic3, open(input_schooltest, "rb") as schooltest:
+        executor = ShiraishiExecutor(cms, dic6, dic3, schooltest, options)
+        executor.main_func()
+
+    click.echo(executor.profiler.format_table(), err=True)
+    if json_out is not None:
+        Path(json_out).write_text(executor.profiler.to_json(), encoding="utf-8")
+    else:
+        click.echo(executor.profiler.to_json())
+
+
+@tb.command(name='batch', help="Run the linking process for many input sets (schools / cohorts) in a process pool")
+@click.option("--manifest", "-m", type=str, required=True,
+              help="Manifest CSV (columns: name, dic6, dic3, schooltest[, cms][, school_id])")
+@click.option("--input-cms", "-ic", type=str,
+              help="Multi-school CMS Data (CSV/UTF-8), partitioned by 学校ID (uses school_id of the manifest)")
+@click.option("--out-dir", "-o", type=str, default="./batch", show_default=True, help="Output directory")
+@click.option("--workers", "-w", type=int, help="Number of worker processes (default: number of CPUs)")
+@click.option("--fast-export", is_flag=True, help="Write result workbooks in write-only mode, concurrently")
+@click.option("--fast-donguri-load", is_flag=True, help="Load only the account columns of DONGURI workbooks, as strings")
+@click.option("--newbie-only-ingest", is_flag=True, help="Read CMS Data in chunks, keeping only newbie rows at read time")
+@click.option("--low-memory", is_flag=True, help="Enable pandas copy-on-write to avoid intermediate copies (lower peak memory)")
+@click.option("--backend", type=click.Choice(["pandas", "polars"]), default="pandas", show_default=True,
+              help="DataFrame backend of dedupe / merge / splits (polars: multi-threaded, requires polars)")
+def batch(manifest: str, input_cms: str, out_dir: str, workers: int, fast_export: bool, fast_donguri_load: bool,
+          newbie_only_ingest: bool, low_memory: bool, backend: str):
+    """
+    Run the linking process for many input sets (schools / cohorts) in a process pool
+    """
+    from src.batch import load_manifest, run_batch
+    from src.executor import ExecutorOptions
+
+    jobs = load_manifest(manifest)
+    options = ExecutorOptions(fast_export=fast_export, fast_donguri_load=fast_donguri_load,
+                              newbie_only_ingest=newbie_only_ingest, low_memory=low_memory, backend=backend)
+    summary = run_batch(jobs, out_dir, cms_path=input_cms, max_workers=workers, options=options)
+    click.echo(summary.to_string(index=False))
+    click.echo(f"Done ({(summary['status'] == 'ok').sum()} / {summary.shape[0]} succeeded)")
+
+
+@tb.command(name='gen-data', help="Generate synthetic input files (CMS / DONGURI 6dic, 3dic / School Test)")
+@click.option("--students", "-n", type=int, default=1_000, show_default=True, help="Number of students (all grades)")
+@click.option("--out-dir", "-o", type=str, required=True, help="Output directory")
+@click.option("--seed", type=int, default=0, show_default=True, help="Random seed")
+def gen_data(students: int, out_dir: str, seed: int):
+    """
+    Generate synthetic input files (CMS / DONGURI 6dic, 3dic / School Test)
+    """
+    from src.synth import generate_inputs
+
+    for key, path in generate_inputs(students, out_dir, seed).items():
+        click.echo(f"{key}: {path}")
+
+
+@tb.command(name='bench', help="Run the pipeline on synthetic inputs of several sizes and compare with the baseline")
+@click.option("--sizes", "-s", type=int, multiple=True, help="Number of students (repeatable, default: 1k/10k/100k/1M)")
+@click.option("--data-dir", type=str, default="./bench/data", show_default=True, help="Directory of generated inputs")
+@click.option("--baseline", type=str, help="Baseline JSON (default: bench/baseline.json)")
+@click.option("--threshold", type=float, help="Allowed slowdown ratio of a stage (default: 0.25)")
+@click.option("--update-baseline", is_flag=True, help="Overwrite the baseline with this result")
+@click.option("--json-out", type=str, help="Write the result as JSON to this file")
+def bench(sizes, data_dir: str, baseline: str, threshold: float, update_baseline: bool, json_out: str):
+    """
+    Run the pipeline on synthetic inputs of several sizes and compare with the baseline
+    """
+    import json
+    import sys
+
+    from src.bench import BENCH_BASELINE_PATH, BENCH_SIZES, BENCH_THRESHOLD
+    from src.bench import find_regressions, run_suite, stage_seconds, suite_meta
+
+    baseline_path = Path(baseline if baseline is not None else BENCH_BASELINE_PATH)
+    results = {}
+    for report in run_suite(list(sizes) or BENCH_SIZES, data_dir):
+        size = str(report.pop("size"))
+        results[size] = report
+        seconds = stage_seconds(report)
+        click.echo(f"size={size:>8} total={seconds['total']:8.3f}s peak={report['peak_rss_mib']:8.1f}MiB")
+        for name, value in seconds.items():
+            if name != "total":
+                click.echo(f"    {name:<32} {value:8.3f}s")
+
+    output = {"meta": suite_meta(), "results": results}
+    if json_out is not None:
+        Path(json_out).write_text(json.dumps(output, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(output, ensure_ascii=False, indent=2), encoding="utf-8")
+        click.echo(f"baseline updated: {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        click.echo(f"no baseline: {baseline_path}")
+        return
+    stored = json.loads(baseline_path.read_text(encoding="utf-8"))
+    regressions = find_regressions(results, stored["results"],
+                                   threshold if threshold is not None else BENCH_THRESHOLD)
+    for regression in regressions:
+        click.echo(f"[REGRESSION] {regression}")
+    if regressions:
+        sys.exit(1)
+    click.echo("no regression")
+
+
+@tb.command(name='bench-export', help="Benchmark the default and the fast export path")
+@click.option("--rows", "-r", type=int, multiple=True, default=[1_000, 10_000, 100_000], show_default=True,
+              help="Rows per sheet (repeatable)")
+def bench_export(rows):
+    """
+    Benchmark the default and the fast export path
+    """
+    from src.bench import bench_export as _bench_export
+
+    for result in _bench_export(list(rows)):
+        click.echo(f"rows={result['rows']:>8} path={result['path']:<8} "
+                   f"time={result['seconds']:8.3f}s peak_rss+={result['peak_mib']:8.1f}MiB")
+
+
+@tb.command(name='bench-donguri-load', help="Benchmark the default and the fast DONGURI account loading")
+@click.option("--rows", "-r", type=int, multiple=True, default=[1_000, 10_000, 100_000], show_default=True,
+              help="Accounts per workbook (repeatable)")
+def bench_donguri_load(rows):
+    """
+    Benchmark the default and the fast DONGURI account loading
+    """
+    from src.bench import bench_donguri_load as _bench_donguri_load
+
+    for result in _bench_donguri_load(list(rows)):
+        click.echo(f"rows={result['rows']:>8} path={result['path']:<8} "
+                   f"time={result['seconds']:8.3f}s peak_rss+={result['peak_mib']:8.1f}MiB")
+
+
+@tb.command(name='bench-low-memory', help="Compare peak memory of the default and the low-memory (copy-on-write) mode")
+@click.option("--input-cms", "-ic", type=str, help="Input file - CMS Data (CSV/UTF-8)", required=True)
+@click.option("--input-dic6", "-id6", type=str, help="Input file - Dict Accounts 6dic (xlsx, or csv / parquet of tmp-cnv)", required=True)
+@click.option("--input-dic3", "-id3", type=str, help="Input file - Dict Accounts 3dic (xlsx, or csv / parquet of tmp-cnv)", required=True)
+@click.option("--input-schooltest", "-ist", type=str, help="Input file - School Test Data (CSV/UTF-8)", required=True)
+@click.option("--newbie-only-ingest", is_flag=True, help="Read CMS Data in chunks, keeping only newbie rows at read time")
+def bench_low_memory(input_cms: str, input_dic6: str, input_dic3: str, input_schooltest: str, newbie_only_ingest: bool):
+    """
+    Compare peak memory of the default and the low-memory (copy-on-write) mode
+    """
+    from src.bench import bench_low_memory as _bench_low_memory
+    from src.executor import ExecutorOptions
+
+    paths = {"cms": input_cms, "dic6": input_dic6, "dic3": input_dic3, "schooltest": input_schooltest}
+    options = ExecutorOptions(out_dir=None, newbie_only_ingest=newbie_only_ingest)
+    for result in _bench_low_memory(paths, options):
+        click.echo(f"mode={result['mode']:<11} total={result['total_seconds']:8.3f}s "
+                   f"peak={result['peak_rss_mib']:8.1f}MiB")
+        for stage in result["stages"]:
+            click.echo(f"    {stage['name']:<32} {stage['seconds']:8.3f}s peak={stage['peak_rss_mib']:8.1f}MiB")
+
+
+@tb.command(name='check-backends', help="Cross-check the DataFrame backends on generated data (byte-identical results)")
+@click.option("--sizes", "-s", type=int, multiple=True, default=[1_000, 10_000], show_default=True,
+              help="Number of students (repeatable)")
+@click.option("--seed", type=int, multiple=True, default=[0], show_default=True, help="Random seed (repeatable)")
+@click.option("--data-dir", type=str, default="./bench/backends", show_default=True, help="Directory of generated inputs")
+@click.option("--newbie-only-ingest", is_flag=True, help="Read CMS Data in chunks, keeping only newbie rows at read time")
+@click.option("--suggest-candidates", is_flag=True, help="Also compare the matching candidates sheet")
+def check_backends(sizes, seed, data_dir: str, newbie_only_ingest: bool, suggest_candidates: bool):
+    """
+    Cross-check the DataFrame backends on generated data (byte-identical results)
+    """
+    import sys
+
+    from src.bench import compare_backends
+    from src.executor import ExecutorOptions
+    from src.synth import generate_inputs, input_paths
+
+    options = ExecutorOptions(out_dir=None, newbie_only_ingest=newbie_only_ingest,
+                              suggest_candidates=suggest_candidates)
+    failed = False
+    for size in sizes:
+        for _seed in seed:
+            case_dir = Path(data_dir) / f"{size}-{_seed}"
+            paths = {key: str(path) for key, path in input_paths(str(case_dir)).items()}
+            if not all(Path(path).exists() for path in paths.values()):
+                generate_inputs(size, str(case_dir), _seed)
+            result = compare_backends(paths, options)
+            seconds = " ".join(f"{backend}={value:.3f}s" for backend, value in result["seconds"].items())
+            click.echo(f"size={size:>8} seed={_seed:<4} {seconds}  "
+                       + ("identical" if not result["mismatches"] else "MISMATCH"))
+            for mismatch in result["mismatches"]:
+                click.echo(f"    [MISMATCH] {mismatch}")
+            failed = failed or bool(result["mismatches"])
+    if failed:
+        sys.exit(1)
+
+
+@tb.command(name='import-budget', help="Check the import time (python -X importtime) of each command against its budget")
+@click.option("--command", "-c", "commands", type=str, multiple=True, help="Command to check (repeatable, default: all)")
+@click.option("--runs", "-r", type=int, default=3, show_default=True, help="Measurements per command (the fastest is used)")
+@click.option("--scale", type=float, default=1.0, show_default=True, help="Multiply the budgets (e.g. 2.0 on slow machines)")
+def import_budget(commands, runs: int, scale: float):
+    """
+    Check the import time (python -X importtime) of each command against its budget
+    """
+    import sys
+
+    from src.importtime import check_budgets
+
+    try:
+        results = check_budgets(list(commands), runs, scale)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    for result in results:
+        status = "ok" if result["ok"] else "OVER BUDGET" if not result["forbidden"] else "FORBIDDEN IMPORT"
+        click.echo(f"{result['command']:<20} {result['ms']:8.1f}ms / {result['budget_ms']:8.1f}ms  {status}")
+        for heavy in result["heaviest"]:
+            click.echo(f"    {heavy['module']:<32} {heavy['ms']:8.1f}ms")
+        for module in result["forbidden"]:
+            click.echo(f"    [FORBIDDEN] {module}")
+    if not all(result["ok"] for result in results):
+        sys.exit(1)
+    click.echo("all commands within budget")
+
+
+@tb.group(name='cache', help="Inspect / clear the cache of prepped input data (shared by the CLI and the app)")
+def cache():
+    pass
+
+
+@cache.command(name='info', help="Show the entries of the cache (least recently used first)")
+@click.option("--cache-dir", type=str, help="Cache directory (default: ./cache/frames)")
+def cache_info(cache_dir: str):
+    """
+    Show the entries of the cache (least recently used first)
+    """
+    import time
+
+    from src.frame_cache import FrameCache
+
+    frame_cache = FrameCache(frame_cache_dir(cache_dir, False))
+    entries = frame_cache.entries()
+    for entry in entries:
+        last_used = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["last_used"]))
+        click.echo(f"{entry['key'][:16]}  {entry['kind']:<14} {entry['format']:<8} "
+                   f"{entry['bytes'] / 2 ** 20:8.2f}MiB  {last_used}")
+    total = sum(entry["bytes"] for entry in entries)
+    click.echo(f"{frame_cache.cache_dir}: {len(entries)} entries, "
+               f"{total / 2 ** 20:.2f}MiB / {frame_cache.max_bytes / 2 ** 20:.0f}MiB")
+
+
+@cache.command(name='clear', help="Remove all entries of the cache")
+@click.option("--cache-dir", type=str, help="Cache directory (default: ./cache/frames)")
+def cache_clear(cache_dir: str):
+    """
+    Remove all entries of the cache
+    """
+    from src.frame_cache import FrameCache
+
+    frame_cache = FrameCache(frame_cache_dir(cache_dir, False))
+    click.echo(f"{frame_cache.cache_dir}: {frame_cache.clear()} entries removed")
+
+
+@tb.command(name='daemon',help="Start the worker daemon (localhost HTTP) that keeps pandas etc. loaded")
+@click.option("--port", "-p", type=int, default=8765, show_default=True, help="Port (listens on 127.0.0.1)")
+@click.option("--workers", "-w", type=int, help="Number of jobs run at once (default: number of CPUs)")
+def daemon(port: int, workers: int):
     """
-    Show statistics of the input file (rakubuy order, CSV/UTF8)
+    Start the worker daemon (localhost HTTP) that keeps pandas etc. loaded
     """
-    stats_manager = StatsManager()
-    stats_manager.load_cms_data(input)
-    stats_manager.aggregate_cms_data()
+    from src.daemon import DAEMON_HOST, WorkerDaemon
 
-    stats_result = stats_manager.get_stats()
+    server = WorkerDaemon(DAEMON_HOST, port, workers)
+    click.echo(f"worker daemon: http://{DAEMON_HOST}:{port} (workers: {server.max_workers})")
+    click.echo(f"token: {server.token_path} (readable only by you, removed on exit)")
+    click.echo(f"client: toolbox.py --daemon http://{DAEMON_HOST}:{port} <command> ... (or TB_DAEMON)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
 
 if __name__ == "__main__":